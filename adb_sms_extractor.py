@@ -1,21 +1,40 @@
+import os
 import subprocess
 import csv
 import re
+import shlex
+import argparse
 from datetime import datetime
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
-from reportlab.lib.pagesizes import A4
-from reportlab.lib import colors
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.pdfbase import pdfmetrics
-from reportlab.pdfbase.ttfonts import TTFont
+import telemetry
+from content_query import build_query_command, combine_where, date_arg, date_to_timestamp, where_contains, where_date_range, where_equals
+
+FONT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fonts')
+_fonts_registered = False
 
 def uses_devanagari(text):
     return bool(re.search(r'[\u0900-\u097F]', text or ''))
 
-pdfmetrics.registerFont(TTFont('NotoDeva', 'fonts/NotoSansDevanagari-Regular.ttf'))
+def register_fonts():
+    """Register the Devanagari font with reportlab once, on first PDF export."""
+    global _fonts_registered
+    if _fonts_registered:
+        return
+    from reportlab.pdfbase import pdfmetrics
+    from reportlab.pdfbase.ttfonts import TTFont
+    pdfmetrics.registerFont(TTFont('NotoDeva', os.path.join(FONT_DIR, 'NotoSansDevanagari-Regular.ttf')))
+    _fonts_registered = True
 
 
+@telemetry.timed('sms.pdf')
 def export_sms_pdf(messages, filename='sms_messages.pdf'):
+    # reportlab is only needed for PDF output, so CSV-only runs never import it.
+    from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
+    from reportlab.lib.pagesizes import A4
+    from reportlab.lib import colors
+    from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+    register_fonts()
+
+    telemetry.count('sms.pdf', rows=len(messages))
     doc = SimpleDocTemplate(filename, pagesize=A4)
     elements = []
     styles = getSampleStyleSheet()
@@ -57,25 +76,28 @@ def export_sms_pdf(messages, filename='sms_messages.pdf'):
     ]))
 
     elements.append(table)
-    doc.build(elements)
+    with telemetry.stage('sms.pdf.build'):
+        doc.build(elements)
     print(f"SMS PDF report saved to {filename}")
 
 
-def run_command(command):
+def run_command(command, timeout=30):
     """Run a system command with better error handling."""
     try:
-        result = subprocess.run(command, 
-                              capture_output=True, 
-                              text=True, 
-                              encoding='utf-8', 
-                              errors='replace',
-                              timeout=30)
+        with telemetry.stage('adb.run_command') as st:
+            result = subprocess.run(command, 
+                                  capture_output=True, 
+                                  text=True, 
+                                  encoding='utf-8', 
+                                  errors='replace',
+                                  timeout=timeout)
+            st.add(nbytes=telemetry.byte_len(result.stdout))
         if result.returncode != 0:
             print(f"Command failed with error:\n{result.stderr}")
             return None
         return result.stdout
     except subprocess.TimeoutExpired:
-        print("Command timed out after 30 seconds")
+        print(f"Command timed out after {timeout} seconds")
         return None
     except Exception as e:
         print(f"Unexpected error: {str(e)}")
@@ -102,7 +124,52 @@ def get_sms_type_label(sms_type):
     }.get(sms_type, 'Unknown')
 
 
-def get_sms_messages():
+SMS_COLUMNS = ['address', 'body', 'date', 'creator', 'type']
+
+
+def build_sms_where(start_date=None, end_date=None, contact=None, sms_type=None):
+    """Selection for the sms tables; dates are YYYY-MM-DD, sms `date` is in ms."""
+    return combine_where(
+        where_date_range('date', start_date, end_date, millis=True),
+        where_contains('address', contact),
+        where_equals('type', sms_type)
+    )
+
+
+def filter_messages(messages, start_date=None, end_date=None, contact=None, sms_type=None):
+    """
+    Apply the same filters locally, for sources that cannot take a selection.
+
+    Rows that lack a filtered field are dropped, since they cannot be shown to match.
+    """
+    try:
+        start = date_to_timestamp(start_date, millis=True) if start_date else None
+        end = date_to_timestamp(end_date, millis=True, next_day=True) if end_date else None
+    except ValueError:
+        print(f"Ignoring invalid date range: {start_date} - {end_date}")
+        start = end = None
+
+    kept = []
+    for msg in messages:
+        if start is not None or end is not None:
+            try:
+                date = int(msg.get('date', ''))
+            except ValueError:
+                continue
+            # mms-sms mixes SMS dates in ms with MMS dates in seconds.
+            if date < 10 ** 11:
+                date *= 1000
+            if (start is not None and date < start) or (end is not None and date >= end):
+                continue
+        if contact and contact.lower() not in msg.get('address', '').lower():
+            continue
+        if sms_type and msg.get('type') != str(sms_type):
+            continue
+        kept.append(msg)
+    return kept
+
+
+def get_sms_messages(start_date=None, end_date=None, contact=None, sms_type=None):
     """Try multiple methods to extract SMS messages."""
     print("Attempting to read SMS messages...")
 
@@ -112,24 +179,35 @@ def get_sms_messages():
         'content://mms-sms/',
         'content://icc/adn'
     ]
+    where = build_sms_where(start_date, end_date, contact, sms_type)
 
     for uri in content_uris:
         print(f"\nTrying URI: {uri}")
-        output = run_command(['adb', 'shell', 'content', 'query', '--uri', uri])
+        if uri.startswith('content://sms/'):
+            # Only the sms tables share these columns; the fallbacks are queried as before.
+            command = build_query_command(uri, projection=SMS_COLUMNS, where=where, sort='date DESC')
+        else:
+            command = ['adb', 'shell', 'content', 'query', '--uri', uri]
+        output = run_command(command)
 
         if output:
             print("RAW OUTPUT FROM ADB:\n", output[:1000])
 
         if output and "Row:" in output:
             print(f"Found data in {uri}")
-            return parse_sms_output(output)
+            messages = parse_sms_output(output)
+            if where and not uri.startswith('content://sms/'):
+                print(f"{uri} does not take the sms filters; filtering {len(messages)} rows locally")
+                messages = filter_messages(messages, start_date, end_date, contact, sms_type)
+            return messages
 
         print(f"No data found in {uri}")
 
     
     print("\nTrying direct database access...")
     db_path = "/data/data/com.android.providers.telephony/databases/mmssms.db"
-    output = run_command(['adb', 'shell', 'sqlite3', db_path, '"SELECT address, body FROM sms;"'])
+    query = "SELECT address, body FROM sms" + (f" WHERE {where}" if where else "") + ";"
+    output = run_command(['adb', 'shell', 'sqlite3', db_path, shlex.quote(query)])
 
     if output:
         print("Found messages via direct database access")
@@ -138,6 +216,7 @@ def get_sms_messages():
     print("\nAll methods failed to retrieve SMS")
     return []
 
+@telemetry.timed('sms.parse', rows=len)
 def parse_sms_output(output):
     """Parse ADB content query output with multiple fields."""
     messages = []
@@ -168,6 +247,7 @@ def parse_sms_output(output):
 
     return messages
 
+@telemetry.timed('sms.parse_sqlite', rows=len)
 def parse_sqlite_output(output):
     """Parse sqlite3 direct query output."""
     messages = []
@@ -181,8 +261,10 @@ def parse_sqlite_output(output):
                 })
     return messages
 
+@telemetry.timed('sms.write_csv')
 def save_messages(messages, filename='sms_messages.csv'):
     """Save extended messages to CSV."""
+    telemetry.count('sms.write_csv', rows=len(messages or []))
     if not messages:
         print("No messages to save")
         return
@@ -209,6 +291,23 @@ def save_messages(messages, filename='sms_messages.csv'):
     print(f"Saved {len(messages)} messages to {filename}")
 
 def main():
+    parser = argparse.ArgumentParser(description="Extract SMS messages over ADB")
+    parser.add_argument('--start-date', type=date_arg, help="Only messages on or after this date (YYYY-MM-DD)")
+    parser.add_argument('--end-date', type=date_arg, help="Only messages up to this date (YYYY-MM-DD)")
+    parser.add_argument('--contact', help="Only messages whose address contains this text")
+    parser.add_argument('--type', dest='sms_type', help="Only this message type (1=Inbox, 2=Sent, ...)")
+    parser.add_argument('--profile', action='store_true', help="Include a cProfile summary in the timing report")
+    parser.add_argument('--trace-memory', action='store_true', help="Include a tracemalloc snapshot in the timing report")
+    args = parser.parse_args()
+
+    telemetry.start(profile=args.profile or None, trace_memory=args.trace_memory or None)
+    try:
+        extract_sms(args)
+    finally:
+        telemetry.write_report('adb_sms_extractor')
+
+
+def extract_sms(args):
     print("Starting SMS extraction...")
 
     devices = run_command(['adb', 'devices'])
@@ -220,7 +319,7 @@ def main():
     check_adb_permissions()
 
     
-    messages = get_sms_messages()
+    messages = get_sms_messages(args.start_date, args.end_date, args.contact, args.sms_type)
 
     if not messages:
         print("\nFailed to retrieve messages. Possible reasons:")
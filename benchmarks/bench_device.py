@@ -0,0 +1,115 @@
+"""End-to-end benchmarks that talk to the fake adb on PATH."""
+import os
+import shutil
+
+from synthetic_data import START_MS, WHATSAPP_MEDIA, TELEGRAM
+
+
+def _dir_bytes(root):
+    return sum(os.path.getsize(os.path.join(d, n)) for d, _, names in os.walk(root) for n in names)
+
+
+def _adb_output_bytes():
+    import telemetry
+    return telemetry.snapshot().get('adb.run_command', {}).get('bytes', 0)
+
+
+def bench_query_sms_all(ctx):
+    from adb_sms_extractor import get_sms_messages
+
+    def run():
+        before = _adb_output_bytes()
+        return len(get_sms_messages()), _adb_output_bytes() - before
+    return run
+
+
+def bench_query_sms_one_week(ctx):
+    from datetime import datetime, timedelta
+    from adb_sms_extractor import get_sms_messages
+    start = datetime.fromtimestamp(START_MS / 1000)
+    end = start + timedelta(days=7)
+
+    def run():
+        before = _adb_output_bytes()
+        messages = get_sms_messages(start.strftime('%Y-%m-%d'), end.strftime('%Y-%m-%d'))
+        return len(messages), _adb_output_bytes() - before
+    return run
+
+
+def _sync_jobs(ctx):
+    from remote_sync import list_remote_tree, split_listing
+    jobs = []
+    for remote_root in (f"/{WHATSAPP_MEDIA}", f"/{TELEGRAM}"):
+        listing = list_remote_tree(remote_root) or {}
+        for folder, folder_listing in split_listing(listing, remote_root).items():
+            jobs.append((f"{remote_root}/{folder}", os.path.join(ctx['work'], 'extracted', folder), folder_listing))
+    return jobs
+
+
+def bench_sync_media_cold(ctx):
+    from remote_sync import sync_trees
+    shutil.rmtree(os.path.join(ctx['work'], 'extracted'), ignore_errors=True)
+
+    def run():
+        stats = sync_trees(_sync_jobs(ctx))
+        return sum(s['pulled'] for s in stats), sum(s['bytes'] for s in stats)
+    return run
+
+
+def bench_sync_media_warm(ctx):
+    from remote_sync import sync_trees
+    sync_trees(_sync_jobs(ctx))
+
+    def run():
+        # Nothing is pulled on a warm run, so report the bytes the listing covered.
+        jobs = _sync_jobs(ctx)
+        stats = sync_trees(jobs)
+        listed = sum(size for _, _, listing in jobs for size, _ in listing.values())
+        return sum(s['files'] for s in stats), listed
+    return run
+
+
+def bench_dedupe_media(ctx):
+    from media_dedup import dedupe_tree
+    source = os.path.join(ctx['data'], 'device', 'sdcard')
+    target = os.path.join(ctx['work'], 'dedupe')
+    shutil.rmtree(target, ignore_errors=True)
+    shutil.copytree(source, target)
+    size = _dir_bytes(target)
+
+    def run():
+        return dedupe_tree(target)['files'], size
+    return run
+
+
+def bench_index_media(ctx):
+    from media_indexer import build_index
+    source = os.path.join(ctx['data'], 'device', 'sdcard')
+    index = os.path.join(ctx['work'], 'media_index.db')
+    if os.path.exists(index):
+        os.remove(index)
+
+    def run():
+        return build_index(source, index), _dir_bytes(source)
+    return run
+
+
+def bench_decrypt_msgstore(ctx):
+    from whatsapp_db_decryptor import decrypt_database, iter_messages
+    backup = os.path.join(ctx['data'], 'msgstore.db.crypt15')
+    out = os.path.join(ctx['work'], 'msgstore.db')
+
+    def run():
+        decrypt_database(backup, os.path.join(ctx['data'], 'key'), out)
+        return sum(1 for _ in iter_messages(out)), os.path.getsize(backup)
+    return run
+
+
+def bench_mms_cold(ctx):
+    from mms_extractor import extract_mms
+    out = os.path.join(ctx['work'], 'mms')
+    shutil.rmtree(out, ignore_errors=True)
+
+    def run():
+        return len(extract_mms(output_dir=out)), _dir_bytes(os.path.join(out, 'attachments'))
+    return run
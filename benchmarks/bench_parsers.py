@@ -0,0 +1,68 @@
+"""Parser and writer benchmarks; inputs are built from the synthetic dataset before timing."""
+import os
+import sqlite3
+
+from fake_adb import format_row
+
+PDF_ROWS = 5000
+
+
+def _dump(data_dir, table):
+    """Unprojected `content query` output for a table, as a device would print it."""
+    conn = sqlite3.connect(os.path.join(data_dir, 'device.db'))
+    cursor = conn.execute(f"SELECT * FROM {table}")
+    names = [d[0] for d in cursor.description]
+    text = ''.join(format_row(i, names, values) for i, values in enumerate(cursor))
+    conn.close()
+    return text
+
+
+def bench_parse_sms_output(ctx):
+    from adb_sms_extractor import parse_sms_output
+    text = _dump(ctx['data'], 'sms')
+
+    def run():
+        return len(parse_sms_output(text)), len(text.encode('utf-8'))
+    return run
+
+
+def bench_parse_call_logs(ctx):
+    from call_log_extractor import parse_call_logs
+    text = _dump(ctx['data'], 'calls')
+
+    def run():
+        return len(parse_call_logs(text)), len(text.encode('utf-8'))
+    return run
+
+
+def bench_parse_chat_lines(ctx):
+    from whatsapp_chat_parser import parse_chat_lines
+    with open(os.path.join(ctx['data'], 'chat.txt'), 'r', encoding='utf-8') as f:
+        lines = f.readlines()
+    size = sum(len(line.encode('utf-8')) for line in lines)
+
+    def run():
+        return len(parse_chat_lines(lines)), size
+    return run
+
+
+def bench_save_sms_csv(ctx):
+    from adb_sms_extractor import parse_sms_output, save_messages
+    messages = parse_sms_output(_dump(ctx['data'], 'sms'))
+    out = os.path.join(ctx['work'], 'sms_messages.csv')
+
+    def run():
+        save_messages(messages, out)
+        return len(messages), os.path.getsize(out)
+    return run
+
+
+def bench_export_sms_pdf(ctx):
+    from adb_sms_extractor import parse_sms_output, export_sms_pdf
+    messages = parse_sms_output(_dump(ctx['data'], 'sms'))[:PDF_ROWS]
+    out = os.path.join(ctx['work'], 'sms_messages.pdf')
+
+    def run():
+        export_sms_pdf(messages, out)
+        return len(messages), os.path.getsize(out)
+    return run
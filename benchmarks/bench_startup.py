@@ -0,0 +1,71 @@
+"""
+Cold-start cost of each tool, measured with `python -X importtime`.
+
+    python benchmarks/bench_startup.py
+"""
+import os
+import sys
+import time
+import subprocess
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MODULES = [
+    'adb_sms_extractor',
+    'call_log_extractor',
+    'media_file_extractor',
+    'mms_extractor',
+    'whatsapp_chat_parser',
+    'unified_data_extractor',
+    'whatsapp_db_decryptor',
+    'media_indexer',
+    'triage',
+]
+RUNS = 5
+
+
+def import_time_us(module):
+    """Cumulative import time of `module` in a fresh interpreter, from -X importtime, or None."""
+    proc = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+                          cwd=REPO_ROOT, capture_output=True, text=True)
+    if proc.returncode != 0:
+        return None
+    for line in proc.stderr.splitlines():
+        parts = [p.strip() for p in line.split('|')]
+        if len(parts) == 3 and parts[2] == module:
+            return int(parts[1])
+    return None
+
+
+def process_time_s(code):
+    """Best-of-RUNS wall time for a fresh interpreter running `code`."""
+    best = None
+    for _ in range(RUNS):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, '-c', code], cwd=REPO_ROOT, capture_output=True)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def bench_import_time(ctx):
+    def run():
+        measured = {m: import_time_us(m) for m in MODULES}
+        details = {f"{m}_ms": us / 1000 for m, us in measured.items() if us is not None}
+        return len(details), 0, details
+    return run
+
+
+def main():
+    baseline = process_time_s('pass')
+    print(f"{'module':<26}{'import ms':>12}{'cold start ms':>16}")
+    print(f"{'(interpreter)':<26}{'':>12}{baseline * 1000:>16.1f}")
+    for module in MODULES:
+        us = import_time_us(module)
+        if us is None:
+            print(f"{module:<26}{'failed':>12}")
+            continue
+        print(f"{module:<26}{us / 1000:>12.1f}{process_time_s(f'import {module}') * 1000:>16.1f}")
+
+
+if __name__ == '__main__':
+    main()
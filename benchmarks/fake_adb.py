@@ -0,0 +1,235 @@
+"""
+A stand-in for the `adb` executable that replays a synthetic device.
+
+Environment:
+    FAKE_ADB_ROOT       dataset directory written by synthetic_data.py (required)
+    FAKE_ADB_LATENCY    seconds added to every invocation (default 0)
+    FAKE_ADB_BANDWIDTH  bytes per second for query output and pulls (default 0 = unlimited)
+
+Supported: devices, shell content query (--projection/--where/--sort), shell find/stat,
+shell ls, shell commands chained with ' ; ', exec-out content read of MMS parts,
+pull [-a] SRC... DEST. Anything else exits non-zero like an unsupported command.
+"""
+import os
+import re
+import sys
+import time
+import shlex
+import shutil
+import sqlite3
+
+ROOT = os.environ.get('FAKE_ADB_ROOT', '')
+LATENCY = float(os.environ.get('FAKE_ADB_LATENCY', '0') or 0)
+BANDWIDTH = float(os.environ.get('FAKE_ADB_BANDWIDTH', '0') or 0)
+WRITE_CHUNK = 64 * 1024
+
+URI_TABLES = {
+    'content://sms': 'sms',
+    'content://sms/': 'sms',
+    'content://call_log/calls': 'calls',
+    'content://media/external/images/media': 'images',
+    'content://media/external/video/media': 'video',
+    'content://media/external/audio/media': 'audio',
+    'content://mms': 'mms',
+    'content://mms/part': 'part',
+}
+URI_FILTERS = {
+    'content://sms/inbox': ('sms', 'type=1'),
+    'content://sms/sent': ('sms', 'type=2'),
+}
+# Like the stock provider, addr is only served per message.
+MMS_ADDR_URI = re.compile(r'^content://mms/(\d+)/addr$')
+MMS_PART_URI = re.compile(r'^content://mms/part/(\d+)$')
+
+
+def throttle(nbytes):
+    if BANDWIDTH > 0:
+        time.sleep(nbytes / BANDWIDTH)
+
+
+def emit(text):
+    emit_bytes(text.encode('utf-8'))
+
+
+def emit_bytes(data):
+    out = sys.stdout.buffer
+    for i in range(0, len(data), WRITE_CHUNK):
+        chunk = data[i:i + WRITE_CHUNK]
+        throttle(len(chunk))
+        out.write(chunk)
+    out.flush()
+
+
+def device_path(remote):
+    return os.path.join(ROOT, 'device', remote.lstrip('/'))
+
+
+def format_row(index, columns, values):
+    fields = ', '.join(f"{c}={'NULL' if v is None else v}" for c, v in zip(columns, values))
+    return f"Row: {index} {fields}\n"
+
+
+def content_query(args):
+    opts = {}
+    i = 0
+    while i < len(args):
+        if args[i].startswith('--') and i + 1 < len(args):
+            opts[args[i][2:]] = args[i + 1]
+            i += 2
+        else:
+            i += 1
+    uri = opts.get('uri', '')
+    table, extra = URI_TABLES.get(uri), None
+    if table is None and uri in URI_FILTERS:
+        table, extra = URI_FILTERS[uri]
+    if table is None and MMS_ADDR_URI.match(uri):
+        table, extra = 'addr', f"msg_id={MMS_ADDR_URI.match(uri).group(1)}"
+    if table is None:
+        sys.stderr.write(f"Error while accessing provider: unknown URI {uri}\n")
+        return 1
+
+    projection = opts.get('projection')
+    columns = projection.split(':') if projection else None
+    clauses = [c for c in (extra, opts.get('where')) if c]
+    sql = f"SELECT {', '.join(columns) if columns else '*'} FROM {table}"
+    if clauses:
+        sql += ' WHERE ' + ' AND '.join(f"({c})" for c in clauses)
+    if opts.get('sort'):
+        sql += f" ORDER BY {opts['sort']}"
+
+    conn = sqlite3.connect(os.path.join(ROOT, 'device.db'))
+    try:
+        cursor = conn.execute(sql)
+    except sqlite3.Error as e:
+        sys.stderr.write(f"Error while accessing provider: {e}\n")
+        return 1
+    names = [d[0] for d in cursor.description]
+    buffer = []
+    size = 0
+    found = False
+    for index, values in enumerate(cursor):
+        found = True
+        line = format_row(index, names, values)
+        buffer.append(line)
+        size += len(line)
+        if size >= WRITE_CHUNK:
+            emit(''.join(buffer))
+            buffer, size = [], 0
+    emit(''.join(buffer) if found else "No result found.\n")
+    return 0
+
+
+def find_stat(argv):
+    """Emulate `find ROOT -type f -exec stat -c '%s %Y %n' {} +`."""
+    remote_root = argv[1]
+    local_root = device_path(remote_root)
+    if not os.path.isdir(local_root):
+        sys.stderr.write(f"find: {remote_root}: No such file or directory\n")
+        return 1
+    lines = []
+    for dirpath, _, names in os.walk(local_root):
+        for name in names:
+            local = os.path.join(dirpath, name)
+            st = os.stat(local)
+            remote = remote_root.rstrip('/') + '/' + os.path.relpath(local, local_root).replace(os.sep, '/')
+            lines.append(f"{st.st_size} {int(st.st_mtime)} {remote}\n")
+    emit(''.join(lines))
+    return 0
+
+
+def content_read(args):
+    uri = args[args.index('--uri') + 1] if '--uri' in args[:-1] else ''
+    match = MMS_PART_URI.match(uri)
+    path = os.path.join(ROOT, 'parts', match.group(1)) if match else ''
+    if not os.path.isfile(path):
+        sys.stderr.write("Error while accessing provider: no such part\n")
+        return 1
+    with open(path, 'rb') as f:
+        emit_bytes(f.read())
+    return 0
+
+
+def shell(args):
+    # adb joins the arguments with spaces and the device shell splits them again.
+    argv = shlex.split(' '.join(args))
+    status = 1
+    while ';' in argv:
+        split = argv.index(';')
+        status = run_shell_command(argv[:split])
+        argv = argv[split + 1:]
+    return run_shell_command(argv) if argv else status
+
+
+def run_shell_command(argv):
+    if not argv:
+        return 1
+    if argv[:2] == ['content', 'query']:
+        return content_query(argv[2:])
+    if argv[:2] == ['content', 'read']:
+        return content_read(argv[2:])
+    if argv[0] == 'find':
+        return find_stat(argv)
+    if argv[0] == 'ls' and len(argv) > 1:
+        local = device_path(argv[-1])
+        if not os.path.isdir(local):
+            sys.stderr.write(f"ls: {argv[-1]}: No such file or directory\n")
+            return 1
+        emit(''.join(f"{name}\n" for name in sorted(os.listdir(local))))
+        return 0
+    if argv[:3] == ['pm', 'list', 'permissions']:
+        emit("permission:android.permission.READ_SMS\n")
+        return 0
+    sys.stderr.write(f"/system/bin/sh: {argv[0]}: inaccessible or not found\n")
+    return 127
+
+
+def copy_throttled(src, dest):
+    with open(src, 'rb') as fin, open(dest, 'wb') as fout:
+        for chunk in iter(lambda: fin.read(WRITE_CHUNK), b''):
+            throttle(len(chunk))
+            fout.write(chunk)
+    shutil.copystat(src, dest)
+
+
+def pull(args):
+    args = [a for a in args if a != '-a']
+    if len(args) < 2:
+        return 1
+    *sources, dest = args
+    status = 0
+    for remote in sources:
+        local = device_path(remote)
+        target = os.path.join(dest, os.path.basename(remote.rstrip('/'))) if os.path.isdir(dest) else dest
+        if os.path.isdir(local):
+            for dirpath, _, names in os.walk(local):
+                out_dir = os.path.join(target, os.path.relpath(dirpath, local))
+                os.makedirs(out_dir, exist_ok=True)
+                for name in names:
+                    copy_throttled(os.path.join(dirpath, name), os.path.join(out_dir, name))
+        elif os.path.isfile(local):
+            copy_throttled(local, target)
+        else:
+            sys.stderr.write(f"adb: error: remote object '{remote}' does not exist\n")
+            status = 1
+    return status
+
+
+def main(argv):
+    if not ROOT:
+        sys.stderr.write("FAKE_ADB_ROOT is not set\n")
+        return 1
+    if LATENCY:
+        time.sleep(LATENCY)
+    if argv[:1] == ['devices']:
+        emit("List of devices attached\nFAKE0001\tdevice\n\n")
+        return 0
+    if argv[:1] in (['shell'], ['exec-out']):
+        return shell(argv[1:])
+    if argv[:1] == ['pull']:
+        return pull(argv[1:])
+    sys.stderr.write(f"fake adb: unsupported command {' '.join(argv)}\n")
+    return 1
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
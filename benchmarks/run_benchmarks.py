@@ -0,0 +1,177 @@
+"""
+Run the benchmark suites against a synthetic device and keep the results for comparison.
+
+    python benchmarks/run_benchmarks.py --rows 100000 --latency 0.05 --bandwidth 20000000
+
+Each bench_* function in the suite modules runs in its own process, so peak RSS is per
+stage (it includes the stage's prepared input). run() returns (rows, bytes), optionally
+followed by a dict of extra per-stage numbers that are kept and compared as well. Results are written to
+benchmarks/results/<timestamp>.json and compared with the previous run at the same scale.
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import importlib
+import subprocess
+from datetime import datetime
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_ROOT = os.path.dirname(BENCH_DIR)
+RESULTS_DIR = os.path.join(BENCH_DIR, 'results')
+SUITES = ['bench_parsers', 'bench_device', 'bench_startup']
+STAGE_TIMEOUT = 3600
+
+
+def discover(selected=None):
+    stages = []
+    sys.path[:0] = [BENCH_DIR, REPO_ROOT]
+    for module_name in SUITES:
+        module = importlib.import_module(module_name)
+        for name in sorted(dir(module)):
+            if name.startswith('bench_') and callable(getattr(module, name)):
+                stage = name[len('bench_'):]
+                if not selected or stage in selected:
+                    stages.append((stage, f"{module_name}:{name}"))
+    return stages
+
+
+def peak_rss_mb():
+    try:
+        import resource
+    except ImportError:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KiB, macOS bytes.
+    return rss / (1024 * 1024) if sys.platform == 'darwin' else rss / 1024
+
+
+def run_child(target, data_dir, work_dir):
+    """Entry point inside the stage process: set up, time run(), print one JSON line."""
+    sys.path[:0] = [BENCH_DIR, REPO_ROOT]
+    module_name, func_name = target.split(':')
+    run = getattr(importlib.import_module(module_name), func_name)({'data': data_dir, 'work': work_dir})
+    start = time.perf_counter()
+    rows, nbytes, *details = run()
+    wall = time.perf_counter() - start
+    result = {'wall_s': wall, 'rows': rows, 'bytes': nbytes, 'peak_rss_mb': peak_rss_mb()}
+    if details:
+        result['details'] = details[0]
+    print(json.dumps(result))
+
+
+def run_stage(target, args, work_dir):
+    env = dict(os.environ)
+    env['PATH'] = os.path.join(BENCH_DIR, 'bin') + os.pathsep + env.get('PATH', '')
+    env['FAKE_ADB_ROOT'] = os.path.abspath(args.data)
+    env['FAKE_ADB_LATENCY'] = str(args.latency)
+    env['FAKE_ADB_BANDWIDTH'] = str(args.bandwidth)
+    command = [sys.executable, os.path.abspath(__file__), '--child', target,
+               '--data', os.path.abspath(args.data), '--work', work_dir]
+    try:
+        proc = subprocess.run(command, cwd=REPO_ROOT, env=env, capture_output=True, text=True,
+                              timeout=args.timeout)
+    except subprocess.TimeoutExpired:
+        return {'error': f"timed out after {args.timeout}s"}
+    lines = proc.stdout.strip().splitlines()
+    if proc.returncode != 0 or not lines:
+        return {'error': (proc.stderr.strip().splitlines() or ['no output'])[-1]}
+    result = json.loads(lines[-1])
+    wall = result['wall_s'] or 1e-9
+    result['rows_per_s'] = result['rows'] / wall
+    result['mb_per_s'] = result['bytes'] / (1024 * 1024) / wall
+    return result
+
+
+def previous_results(params):
+    if not os.path.isdir(RESULTS_DIR):
+        return None
+    for name in sorted(os.listdir(RESULTS_DIR), reverse=True):
+        try:
+            with open(os.path.join(RESULTS_DIR, name), 'r', encoding='utf-8') as f:
+                report = json.load(f)
+        except (OSError, ValueError):
+            continue
+        if report.get('params') == params:
+            return report
+    return None
+
+
+def _change(new, old):
+    if not old:
+        return ''
+    return f"{(new - old) / old * 100:+.1f}%"
+
+
+def print_table(stages, previous):
+    old_stages = previous['stages'] if previous else {}
+    print(f"\n{'stage':<22}{'wall s':>10}{'rows/s':>14}{'MB/s':>10}{'RSS MB':>10}{'vs prev':>10}")
+    for stage, result in stages.items():
+        if 'error' in result:
+            print(f"{stage:<22}  error: {result['error']}")
+            continue
+        old = old_stages.get(stage, {})
+        rss = result['peak_rss_mb']
+        print(f"{stage:<22}{result['wall_s']:>10.3f}{result['rows_per_s']:>14,.0f}{result['mb_per_s']:>10.1f}"
+              f"{rss if rss is not None else float('nan'):>10.1f}"
+              f"{_change(result['wall_s'], old.get('wall_s')):>10}")
+        old_details = old.get('details', {})
+        for key, value in result.get('details', {}).items():
+            print(f"  {key:<34}{value:>10.3f}{_change(value, old_details.get(key)):>44}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the extractors against a fake device")
+    parser.add_argument('--data', default=os.path.join(BENCH_DIR, 'data'), help="Synthetic dataset directory")
+    parser.add_argument('--rows', type=int, default=10000, help="Rows to generate if the dataset is missing")
+    parser.add_argument('--media-files', type=int, default=500)
+    parser.add_argument('--regenerate', action='store_true', help="Rebuild the dataset first")
+    parser.add_argument('--latency', type=float, default=0.0, help="Seconds of latency per adb call")
+    parser.add_argument('--bandwidth', type=float, default=0.0, help="Bytes/s over the fake USB link (0 = unlimited)")
+    parser.add_argument('--stage', action='append', help="Run only these stages (repeatable)")
+    parser.add_argument('--timeout', type=int, default=STAGE_TIMEOUT)
+    parser.add_argument('--child', help=argparse.SUPPRESS)
+    parser.add_argument('--work', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_child(args.child, args.data, args.work)
+        return
+
+    sys.path[:0] = [BENCH_DIR, REPO_ROOT]
+    from synthetic_data import generate
+    if args.regenerate or not os.path.exists(os.path.join(args.data, 'device.db')):
+        generate(args.data, args.rows, args.media_files)
+
+    work_dir = os.path.join(os.path.abspath(args.data), 'work')
+    os.makedirs(work_dir, exist_ok=True)
+    params = {
+        'dataset_bytes': os.path.getsize(os.path.join(args.data, 'device.db')),
+        'latency': args.latency,
+        'bandwidth': args.bandwidth
+    }
+
+    stages = {}
+    for stage, target in discover(args.stage):
+        print(f"Running {stage}...")
+        stages[stage] = run_stage(target, args, work_dir)
+
+    previous = previous_results(params)
+    print_table(stages, previous)
+
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    report = {
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'python': sys.version.split()[0],
+        'params': params,
+        'stages': stages
+    }
+    path = os.path.join(RESULTS_DIR, datetime.now().strftime('%Y%m%d_%H%M%S') + '.json')
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+    print(f"\nResults saved to {path}")
+
+
+if __name__ == '__main__':
+    main()
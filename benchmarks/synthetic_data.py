@@ -0,0 +1,259 @@
+"""
+Generate a synthetic device for the benchmarks.
+
+Layout of the output directory:
+    device.db   SQLite tables backing the fake content providers (sms, mms, calls, media)
+    parts/      MMS attachment data, one file per part id
+    chat.txt    WhatsApp "export chat" text file
+    device/     fake device filesystem, e.g. device/sdcard/Android/media/com.whatsapp/...
+    msgstore.db (+ .crypt15 and key, when cryptography is installed)
+"""
+import os
+import sys
+import random
+import sqlite3
+import struct
+import argparse
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+WHATSAPP_MEDIA = "sdcard/Android/media/com.whatsapp/WhatsApp/Media"
+TELEGRAM = "sdcard/Android/media/org.telegram.messenger/Telegram"
+DCIM = "sdcard/DCIM/Camera"
+
+START_MS = int(datetime(2023, 1, 1).timestamp() * 1000)
+SPAN_MS = 365 * 24 * 3600 * 1000
+BATCH = 50000
+
+WORDS = ("ok call me later meeting tomorrow पैसे भेज दो where are you at the station "
+         "send the file now thanks bhai kal milte hain, see you").split()
+
+SMS_COLUMNS = [
+    ('_id', 'INTEGER PRIMARY KEY'), ('thread_id', 'INTEGER'), ('address', 'TEXT'), ('person', 'INTEGER'),
+    ('date', 'INTEGER'), ('date_sent', 'INTEGER'), ('protocol', 'INTEGER'), ('read', 'INTEGER'),
+    ('status', 'INTEGER'), ('type', 'INTEGER'), ('reply_path_present', 'INTEGER'), ('subject', 'TEXT'),
+    ('body', 'TEXT'), ('service_center', 'TEXT'), ('locked', 'INTEGER'), ('sub_id', 'INTEGER'),
+    ('error_code', 'INTEGER'), ('creator', 'TEXT'), ('seen', 'INTEGER')
+]
+CALL_COLUMNS = [
+    ('_id', 'INTEGER PRIMARY KEY'), ('number', 'TEXT'), ('name', 'TEXT'), ('type', 'INTEGER'),
+    ('date', 'INTEGER'), ('duration', 'INTEGER'), ('new', 'INTEGER'), ('numbertype', 'INTEGER'),
+    ('countryiso', 'TEXT'), ('geocoded_location', 'TEXT'), ('features', 'INTEGER'),
+    ('phone_account_address', 'TEXT'), ('via_number', 'TEXT')
+]
+MEDIA_COLUMNS = [
+    ('_id', 'INTEGER PRIMARY KEY'), ('_data', 'TEXT'), ('_display_name', 'TEXT'), ('_size', 'INTEGER'),
+    ('date_added', 'INTEGER'), ('date_modified', 'INTEGER'), ('mime_type', 'TEXT'), ('title', 'TEXT'),
+    ('bucket_display_name', 'TEXT'), ('width', 'INTEGER'), ('height', 'INTEGER'), ('owner_package_name', 'TEXT')
+]
+MMS_COLUMNS = [
+    ('_id', 'INTEGER PRIMARY KEY'), ('thread_id', 'INTEGER'), ('date', 'INTEGER'), ('msg_box', 'INTEGER'),
+    ('m_type', 'INTEGER'), ('read', 'INTEGER'), ('sub', 'TEXT'), ('ct_t', 'TEXT')
+]
+PART_COLUMNS = [
+    ('_id', 'INTEGER PRIMARY KEY'), ('mid', 'INTEGER'), ('seq', 'INTEGER'), ('ct', 'TEXT'), ('name', 'TEXT'),
+    ('chset', 'INTEGER'), ('cl', 'TEXT'), ('_data', 'TEXT'), ('text', 'TEXT')
+]
+ADDR_COLUMNS = [
+    ('_id', 'INTEGER PRIMARY KEY'), ('msg_id', 'INTEGER'), ('address', 'TEXT'), ('type', 'INTEGER'),
+    ('charset', 'INTEGER')
+]
+OWN_NUMBER = '+919812345678'
+
+
+def _phone(rng):
+    return f"+91{rng.randrange(7000000000, 9999999999)}"
+
+
+def _text(rng, words=8):
+    return ' '.join(rng.choice(WORDS) for _ in range(rng.randrange(1, words)))
+
+
+def _create(conn, table, columns):
+    conn.execute(f"DROP TABLE IF EXISTS {table}")
+    conn.execute(f"CREATE TABLE {table} ({', '.join(f'{n} {t}' for n, t in columns)})")
+
+
+def _fill(conn, table, width, count, make_row):
+    placeholders = ','.join('?' * width)
+    for start in range(0, count, BATCH):
+        conn.executemany(f"INSERT INTO {table} VALUES ({placeholders})",
+                         [make_row(i) for i in range(start, min(count, start + BATCH))])
+
+
+def generate_providers(out_dir, rows, rng):
+    contacts = [_phone(rng) for _ in range(max(10, rows // 200))]
+    conn = sqlite3.connect(os.path.join(out_dir, 'device.db'))
+
+    _create(conn, 'sms', SMS_COLUMNS)
+    _fill(conn, 'sms', len(SMS_COLUMNS), rows, lambda i: (
+        i + 1, rng.randrange(1, 500), rng.choice(contacts), None, START_MS + rng.randrange(SPAN_MS),
+        START_MS + rng.randrange(SPAN_MS), 0, 1, -1, rng.choice((1, 1, 2, 2, 3, 5)), 0, None,
+        _text(rng, 30), '+919800000000', 0, 1, 0, 'com.google.android.apps.messaging', 1))
+
+    _create(conn, 'calls', CALL_COLUMNS)
+    _fill(conn, 'calls', len(CALL_COLUMNS), rows, lambda i: (
+        i + 1, rng.choice(contacts), rng.choice(('', 'Mom', 'Office', 'Ravi Kumar')), rng.randrange(1, 8),
+        START_MS + rng.randrange(SPAN_MS), rng.randrange(0, 4000), 0, 2, 'IN', 'India', 0, '', ''))
+    conn.commit()
+    return conn
+
+
+def generate_mms(out_dir, messages, rng, conn):
+    """MMS with a SMIL part, a text part and up to two images; some images are resent."""
+    parts_dir = os.path.join(out_dir, 'parts')
+    os.makedirs(parts_dir, exist_ok=True)
+    contacts = [_phone(rng) for _ in range(max(5, messages // 50))]
+    _create(conn, 'mms', MMS_COLUMNS)
+    _create(conn, 'part', PART_COLUMNS)
+    _create(conn, 'addr', ADDR_COLUMNS)
+    start_s = START_MS // 1000
+    shared = []
+    part_id = addr_id = 0
+    for i in range(1, messages + 1):
+        box = rng.choice((1, 1, 2))
+        conn.execute("INSERT INTO mms VALUES (?,?,?,?,?,?,?,?)", (
+            i, rng.randrange(1, 200), start_s + rng.randrange(SPAN_MS // 1000), box, 132 if box == 1 else 128,
+            1, rng.choice((None, 'Photos', 'Re: trip')), 'application/vnd.wap.multipart.related'))
+        other = rng.choice(contacts)
+        for address, kind in ((other, 137), (OWN_NUMBER, 151)) if box == 1 else ((OWN_NUMBER, 137), (other, 151)):
+            addr_id += 1
+            conn.execute("INSERT INTO addr VALUES (?,?,?,?,?)", (addr_id, i, address, kind, 106))
+
+        parts = [('application/smil', 'smil.xml', None, '<smil><body><par/></body></smil>'),
+                 ('text/plain', 'text_0.txt', None, _text(rng, 20))]
+        for n in range(rng.randrange(3)):
+            if shared and rng.random() < 0.2:
+                content = rng.choice(shared)
+            else:
+                content = _bmp(32, 24, rng)
+                if len(shared) < 20:
+                    shared.append(content)
+            parts.append(('image/bmp', f'IMG_{i:05d}_{n}.bmp', content, None))
+        for seq, (ct, name, content, text) in enumerate(parts, -1):
+            part_id += 1
+            data = None
+            if content is not None:
+                data = f"/data/user_de/0/com.android.providers.telephony/app_parts/PART_{part_id}"
+                with open(os.path.join(parts_dir, str(part_id)), 'wb') as f:
+                    f.write(content)
+            conn.execute("INSERT INTO part VALUES (?,?,?,?,?,?,?,?,?)", (
+                part_id, i, seq, ct, name, 106, name, data, text))
+    conn.commit()
+
+
+def generate_chat(out_dir, rows, rng):
+    dt = datetime(2023, 1, 1, 9, 0)
+    senders = ['Asha', 'Ravi Kumar', '+91 98765 43210', 'Me']
+    with open(os.path.join(out_dir, 'chat.txt'), 'w', encoding='utf-8') as f:
+        for _ in range(rows):
+            dt += timedelta(minutes=rng.randrange(1, 90))
+            stamp = f"{dt.day:02d}/{dt.month:02d}/{dt.strftime('%y')}, {dt.strftime('%I:%M').lstrip('0')} " \
+                    f"{dt.strftime('%p').lower()}"
+            f.write(f"{stamp} - {rng.choice(senders)}: {_text(rng, 20)}\n")
+
+
+def _bmp(width, height, rng):
+    """A small uncompressed 24-bit BMP, readable by PIL without any encoder."""
+    row = (width * 3 + 3) & ~3
+    pixels = rng.randbytes(row * height)
+    header = struct.pack('<2sIHHI', b'BM', 54 + len(pixels), 0, 0, 54)
+    info = struct.pack('<IiiHHIIiiII', 40, width, height, 1, 24, 0, len(pixels), 2835, 2835, 0, 0)
+    return header + info + pixels
+
+
+def generate_media(out_dir, media_files, media_size, rng, conn):
+    """Write media under the fake sdcard; about a fifth are copies shared across apps."""
+    device = os.path.join(out_dir, 'device')
+    folders = {
+        f"{WHATSAPP_MEDIA}/WhatsApp Images": '.jpg',
+        f"{WHATSAPP_MEDIA}/WhatsApp Video": '.mp4',
+        f"{WHATSAPP_MEDIA}/WhatsApp Voice Notes": '.opus',
+        f"{TELEGRAM}/Telegram Images": '.jpg',
+        DCIM: '.jpg'
+    }
+    for folder in folders:
+        os.makedirs(os.path.join(device, folder), exist_ok=True)
+
+    _create(conn, 'images', MEDIA_COLUMNS)
+    _create(conn, 'video', MEDIA_COLUMNS)
+    _create(conn, 'audio', MEDIA_COLUMNS)
+    shared = []
+    start_s = START_MS // 1000
+    for i in range(media_files):
+        folder = rng.choice(list(folders))
+        ext = folders[folder]
+        if shared and rng.random() < 0.2:
+            content = rng.choice(shared)
+        elif ext == '.jpg':
+            content = _bmp(64, 48, rng)
+            content += rng.randbytes(max(0, media_size - len(content)))
+        else:
+            content = rng.randbytes(media_size)
+        if len(shared) < 50:
+            shared.append(content)
+        name = f"IMG-{i:06d}{ext}"
+        remote = f"/{folder}/{name}"
+        with open(os.path.join(device, folder, name), 'wb') as f:
+            f.write(content)
+        table = {'.jpg': 'images', '.mp4': 'video', '.opus': 'audio'}[ext]
+        added = start_s + rng.randrange(SPAN_MS // 1000)
+        conn.execute(f"INSERT INTO {table} VALUES (?,?,?,?,?,?,?,?,?,?,?,?)", (
+            i + 1, remote, name, len(content), added, added, 'application/octet-stream', name,
+            os.path.basename(folder), 64, 48, 'com.whatsapp'))
+    conn.commit()
+
+
+def generate_msgstore(out_dir, rows, rng):
+    conn = sqlite3.connect(os.path.join(out_dir, 'msgstore.db'))
+    conn.executescript("""
+        DROP TABLE IF EXISTS jid; DROP TABLE IF EXISTS chat; DROP TABLE IF EXISTS message;
+        CREATE TABLE jid (_id INTEGER PRIMARY KEY, raw_string TEXT);
+        CREATE TABLE chat (_id INTEGER PRIMARY KEY, jid_row_id INTEGER, subject TEXT);
+        CREATE TABLE message (_id INTEGER PRIMARY KEY, chat_row_id INTEGER, from_me INTEGER,
+                              sender_jid_row_id INTEGER, timestamp INTEGER, text_data TEXT);
+    """)
+    conn.executemany("INSERT INTO jid VALUES (?, ?)", [(i, f"91{9000000000 + i}@s.whatsapp.net") for i in range(1, 101)])
+    conn.executemany("INSERT INTO chat VALUES (?, ?, ?)", [(i, i, None) for i in range(1, 101)])
+    _fill(conn, 'message', 6, rows, lambda i: (
+        i + 1, rng.randrange(1, 101), rng.randrange(2), None, START_MS + i * 1000, _text(rng, 20)))
+    conn.commit()
+    conn.close()
+
+    try:
+        from whatsapp_db_decryptor import encrypt_database
+    except ImportError:
+        print("cryptography not installed, skipping the encrypted msgstore fixture")
+        return
+    with open(os.path.join(out_dir, 'key'), 'w') as f:
+        f.write(os.urandom(32).hex())
+    encrypt_database(os.path.join(out_dir, 'msgstore.db'), os.path.join(out_dir, 'key'),
+                     os.path.join(out_dir, 'msgstore.db.crypt15'))
+
+
+def generate(out_dir, rows=1000, media_files=200, media_size=64 * 1024, seed=1):
+    os.makedirs(out_dir, exist_ok=True)
+    rng = random.Random(seed)
+    conn = generate_providers(out_dir, rows, rng)
+    generate_media(out_dir, media_files, media_size, rng, conn)
+    generate_mms(out_dir, max(1, rows // 10), rng, conn)
+    conn.close()
+    generate_chat(out_dir, rows, rng)
+    generate_msgstore(out_dir, rows, rng)
+    print(f"Generated {rows} rows, {max(1, rows // 10)} MMS and {media_files} media files in {out_dir}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a synthetic device for the benchmarks")
+    parser.add_argument('out_dir')
+    parser.add_argument('--rows', type=int, default=1000, help="Rows per provider table and chat lines")
+    parser.add_argument('--media-files', type=int, default=200)
+    parser.add_argument('--media-size', type=int, default=64 * 1024, help="Bytes per media file")
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+    generate(args.out_dir, args.rows, args.media_files, args.media_size, args.seed)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,13 +1,19 @@
 import subprocess
 import csv
+import argparse
 from datetime import datetime
 import re
-from reportlab.lib.pagesizes import A4
-from reportlab.lib import colors
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
+import telemetry
+from content_query import build_query_command, combine_where, date_arg, where_contains, where_date_range, where_equals
 
+@telemetry.timed('calls.pdf')
 def export_call_logs_pdf(logs, filename='call_logs.pdf'):
+    from reportlab.lib.pagesizes import A4
+    from reportlab.lib import colors
+    from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+    from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
+
+    telemetry.count('calls.pdf', rows=len(logs))
     doc = SimpleDocTemplate(filename, pagesize=A4)
     elements = []
     styles = getSampleStyleSheet()
@@ -55,7 +61,8 @@ def export_call_logs_pdf(logs, filename='call_logs.pdf'):
     ]))
 
     elements.append(table)
-    doc.build(elements)
+    with telemetry.stage('calls.pdf.build'):
+        doc.build(elements)
     print(f"PDF report saved to {filename}")
 
 
@@ -65,7 +72,9 @@ def export_call_logs_pdf(logs, filename='call_logs.pdf'):
 
 def run_command(command):
     try:
-        result = subprocess.run(command, capture_output=True, text=True, encoding='utf-8', timeout=30)
+        with telemetry.stage('adb.run_command') as st:
+            result = subprocess.run(command, capture_output=True, text=True, encoding='utf-8', timeout=30)
+            st.add(nbytes=telemetry.byte_len(result.stdout))
         if result.returncode != 0:
             print(f"Command failed: {result.stderr}")
             return None
@@ -74,6 +83,18 @@ def run_command(command):
         print(f"Error: {str(e)}")
         return None
 
+CALL_LOG_COLUMNS = ['number', 'name', 'type', 'date', 'duration']
+
+
+def build_call_log_where(start_date=None, end_date=None, contact=None, call_type=None):
+    return combine_where(
+        where_date_range('date', start_date, end_date, millis=True),
+        where_contains('number', contact),
+        where_equals('type', call_type)
+    )
+
+
+@telemetry.timed('calls.parse', rows=len)
 def parse_call_logs(output):
     call_logs = []
     row_pattern = re.compile(r'^Row: \d+ (.+)$')
@@ -132,7 +153,9 @@ def format_duration(seconds_str):
         return seconds_str
 
 
+@telemetry.timed('calls.write_csv')
 def save_call_logs(logs, filename='call_logs.csv'):
+    telemetry.count('calls.write_csv', rows=len(logs or []))
     if not logs:
         print("No call logs found.")
         return
@@ -160,8 +183,27 @@ def save_call_logs(logs, filename='call_logs.csv'):
     print(f"Saved {len(logs)} call logs to {filename}")
 
 def main():
+    parser = argparse.ArgumentParser(description="Extract call logs over ADB")
+    parser.add_argument('--start-date', type=date_arg, help="Only calls on or after this date (YYYY-MM-DD)")
+    parser.add_argument('--end-date', type=date_arg, help="Only calls up to this date (YYYY-MM-DD)")
+    parser.add_argument('--contact', help="Only calls whose number contains this text")
+    parser.add_argument('--type', dest='call_type', help="Only this call type (1=Incoming, 2=Outgoing, ...)")
+    parser.add_argument('--profile', action='store_true', help="Include a cProfile summary in the timing report")
+    parser.add_argument('--trace-memory', action='store_true', help="Include a tracemalloc snapshot in the timing report")
+    args = parser.parse_args()
+
+    telemetry.start(profile=args.profile or None, trace_memory=args.trace_memory or None)
+    try:
+        extract_call_logs(args)
+    finally:
+        telemetry.write_report('call_log_extractor')
+
+
+def extract_call_logs(args):
     print("Fetching call logs...")
-    output = run_command(['adb', 'shell', 'content', 'query', '--uri', 'content://call_log/calls'])
+    where = build_call_log_where(args.start_date, args.end_date, args.contact, args.call_type)
+    output = run_command(build_query_command('content://call_log/calls', projection=CALL_LOG_COLUMNS,
+                                             where=where, sort='date DESC'))
     if not output:
         print("Failed to retrieve call logs")
         return
@@ -0,0 +1,90 @@
+import shlex
+import argparse
+from datetime import datetime, timedelta
+
+
+def _sql_literal(value):
+    """Quote a value as an SQL string literal for a content provider selection."""
+    return "'" + str(value).replace("'", "''") + "'"
+
+
+def date_to_timestamp(date_str, millis=False, next_day=False):
+    """Convert a YYYY-MM-DD string to a local epoch timestamp (seconds or ms) of its midnight, or the next one."""
+    dt = datetime.strptime(date_str, '%Y-%m-%d')
+    if next_day:
+        dt += timedelta(days=1)
+    ts = int(dt.timestamp())
+    return ts * 1000 if millis else ts
+
+
+def date_arg(value):
+    """argparse type for YYYY-MM-DD options, so a bad date fails instead of dropping the filter."""
+    try:
+        datetime.strptime(value, '%Y-%m-%d')
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid date {value!r}, expected YYYY-MM-DD")
+    return value
+
+
+def where_date_range(column, start_date_str=None, end_date_str=None, millis=False, end_of_day=True):
+    """
+    Build a date range clause; either bound may be omitted.
+
+    The end date is included as a whole day; with end_of_day=False the range
+    stops at its midnight instead.
+    """
+    clauses = []
+    try:
+        if start_date_str:
+            clauses.append(f"{column}>={date_to_timestamp(start_date_str, millis)}")
+        if end_date_str and end_of_day:
+            clauses.append(f"{column}<{date_to_timestamp(end_date_str, millis, next_day=True)}")
+        elif end_date_str:
+            clauses.append(f"{column}<={date_to_timestamp(end_date_str, millis)}")
+    except ValueError:
+        print(f"Ignoring invalid date range: {start_date_str} - {end_date_str}")
+        return None
+    return combine_where(*clauses)
+
+
+def where_equals(column, value):
+    if value in (None, ''):
+        return None
+    return f"{column}={_sql_literal(value)}"
+
+
+def where_contains(column, text):
+    """Case-insensitive substring match, same semantics as the local folder filter."""
+    if not text or text == "All":
+        return None
+    escaped = str(text).replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+    return f"{column} LIKE {_sql_literal('%' + escaped + '%')} ESCAPE '\\'"
+
+
+def combine_where(*clauses):
+    """AND together the non-empty clauses, or return None if there are none."""
+    clauses = [c for c in clauses if c]
+    if not clauses:
+        return None
+    if len(clauses) == 1:
+        return clauses[0]
+    return ' AND '.join(f"({c})" for c in clauses)
+
+
+def build_query_command(uri, projection=None, where=None, sort=None, user=None):
+    """
+    Build an `adb shell content query` command that filters and projects on the device.
+
+    adb joins the shell arguments with spaces and hands them to the device shell,
+    so the selection and sort order are quoted for that shell here.
+    """
+    command = ['adb', 'shell', 'content', 'query', '--uri', uri]
+    if projection:
+        command += ['--projection', ':'.join(projection)]
+    if where:
+        command += ['--where', shlex.quote(where)]
+    if sort:
+        command += ['--sort', shlex.quote(sort)]
+    if user is not None:
+        command += ['--user', str(user)]
+    return command
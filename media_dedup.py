@@ -0,0 +1,215 @@
+import os
+import json
+import hashlib
+import argparse
+import telemetry
+
+MANIFEST_NAME = ".dedup_manifest.json"
+SKIP_NAMES = {MANIFEST_NAME, ".sync_manifest.json"}
+PARTIAL_BYTES = 64 * 1024
+READ_CHUNK = 1024 * 1024
+
+
+def partial_hash(path, size):
+    """Hash the first and last PARTIAL_BYTES; cheap way to split same-size candidates."""
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        h.update(f.read(PARTIAL_BYTES))
+        if size > 2 * PARTIAL_BYTES:
+            f.seek(-PARTIAL_BYTES, os.SEEK_END)
+            h.update(f.read(PARTIAL_BYTES))
+    return h.hexdigest()
+
+
+def full_hash(path):
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(READ_CHUNK), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def load_manifest(root):
+    try:
+        with open(os.path.join(root, MANIFEST_NAME), 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        manifest = {}
+    manifest.setdefault('objects', {})
+    manifest.setdefault('hashes', {})
+    return manifest
+
+
+def save_manifest(root, manifest):
+    path = os.path.join(root, MANIFEST_NAME)
+    with open(path + '.tmp', 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=1, sort_keys=True)
+    os.replace(path + '.tmp', path)
+
+
+def _scan(dirs):
+    """Return {path: stat} for regular files under each of dirs."""
+    files = {}
+    for dirpath, _, names in (entry for d in dirs for entry in os.walk(d)):
+        for name in names:
+            if name in SKIP_NAMES or name.endswith('.tmp'):
+                continue
+            path = os.path.join(dirpath, name)
+            try:
+                st = os.lstat(path)
+            except OSError:
+                continue
+            if os.path.isfile(path) and not os.path.islink(path):
+                files[path] = st
+    return files
+
+
+def _link_into_place(canonical, duplicate):
+    """Replace duplicate with a hardlink to canonical; False if the filesystem refuses."""
+    tmp_path = duplicate + '.dedup.tmp'
+    try:
+        os.link(canonical, tmp_path)
+        os.replace(tmp_path, duplicate)
+        return True
+    except OSError:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        return False
+
+
+@telemetry.timed('dedupe')
+def dedupe_tree(root, link=True, dirs=None):
+    """
+    Store each distinct file under root once.
+
+    Only the given dirs under root are scanned (all of root by default); pass the
+    pulled media folders, never directories whose files are rewritten in place,
+    since a rewrite would change every linked copy.
+
+    Candidates are narrowed by size, then by a partial hash, then by a full SHA-256.
+    Duplicates become hardlinks to one canonical copy; where linking is not possible
+    they stay as files and are only recorded as references. The content-addressed
+    manifest (sha256 -> size, paths and each copy's original mtime/atime in ns)
+    and a cache of partial and full hashes are kept in root. Returns a stats dict.
+    """
+    manifest = load_manifest(root)
+    cache = manifest['hashes']
+    # Times recorded before an earlier run linked a copy; its inode now carries the canonical's.
+    old_times = {path: times for obj in manifest['objects'].values() for path, times in obj.get('times', {}).items()}
+    files = _scan(dirs or [root])
+
+    # Files that are already hardlinks of each other only need hashing once.
+    by_inode = {}
+    for path, st in files.items():
+        by_inode.setdefault((st.st_dev, st.st_ino), []).append(path)
+    first_of = {path: sorted(paths)[0] for paths in by_inode.values() for path in paths}
+
+    by_size = {}
+    for paths in by_inode.values():
+        by_size.setdefault(files[paths[0]].st_size, []).append(sorted(paths))
+
+    digests = {}
+    partials = {}
+    hashed_bytes = 0
+    for size, groups in by_size.items():
+        # A single group still counts if it is already a set of linked copies.
+        if len(groups) < 2 and len(groups[0]) < 2:
+            continue
+        by_partial = {}
+        known_partials = set()
+        for paths in groups:
+            st = files[paths[0]]
+            cached = cache.get(paths[0])
+            if not (cached and cached[0] == size and cached[1] == st.st_mtime_ns):
+                cached = None
+            partial = cached[3] if cached and len(cached) > 3 else None
+            if partial is None:
+                partial = partial_hash(paths[0], size)
+            partials[paths[0]] = partial
+            if cached and cached[2]:
+                digests[paths[0]] = cached[2]
+                known_partials.add(partial)
+                continue
+            by_partial.setdefault(partial, []).append(paths)
+        for partial, candidates in by_partial.items():
+            # A lone candidate only needs a full hash if it may equal a file whose digest came from the cache.
+            if len(candidates) < 2 and len(candidates[0]) < 2 and partial not in known_partials:
+                continue
+            for paths in candidates:
+                digests[paths[0]] = full_hash(paths[0])
+                hashed_bytes += size
+
+    by_digest = {}
+    for first, digest in digests.items():
+        by_digest.setdefault(digest, []).extend(by_inode[(files[first].st_dev, files[first].st_ino)])
+
+    objects = {}
+    saved = linked = referenced = 0
+    for digest, paths in by_digest.items():
+        paths = sorted(paths)
+        canonical = paths[0]
+        canonical_st = files[canonical]
+        size = canonical_st.st_size
+        times = {}
+        for path in paths:
+            st = files[path]
+            if path in old_times and st.st_nlink > 1:
+                times[path] = old_times[path]
+            else:
+                times[path] = [st.st_mtime_ns, st.st_atime_ns]
+        for path in paths[1:]:
+            st = files[path]
+            if (st.st_dev, st.st_ino) == (canonical_st.st_dev, canonical_st.st_ino):
+                continue
+            if link and _link_into_place(canonical, path):
+                linked += 1
+                saved += size
+            else:
+                referenced += 1
+        if len(paths) > 1:
+            objects[digest] = {'size': size, 'paths': paths, 'times': times}
+        for path in paths:
+            st = os.stat(path)
+            cache[path] = [st.st_size, st.st_mtime_ns, digest, partials[first_of[path]]]
+
+    # Partial hashes of files with no full hash yet, so the next run does not reread them.
+    for first, partial in partials.items():
+        if first not in digests:
+            for path in by_inode[(files[first].st_dev, files[first].st_ino)]:
+                cache[path] = [files[path].st_size, files[path].st_mtime_ns, None, partial]
+
+    for path in list(cache):
+        if path not in files:
+            del cache[path]
+    manifest['objects'] = objects
+    save_manifest(root, manifest)
+
+    stats = {
+        'files': len(files),
+        'duplicate_groups': len(objects),
+        'linked': linked,
+        'referenced': referenced,
+        'bytes_saved': saved,
+        'bytes_hashed': hashed_bytes
+    }
+    telemetry.count('dedupe', rows=len(files), nbytes=hashed_bytes)
+    print(f"Deduplicated {root}: {linked} files hardlinked, {referenced} recorded as references, "
+          f"{saved / (1024 * 1024):.1f} MB saved")
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Deduplicate pulled files by content")
+    parser.add_argument('root', nargs='?', default='extracted')
+    parser.add_argument('--dir', action='append', help="Only deduplicate this directory under root (repeatable)")
+    parser.add_argument('--no-link', action='store_true', help="Only record duplicates, do not hardlink them")
+    args = parser.parse_args()
+    telemetry.start()
+    try:
+        dedupe_tree(args.root, link=not args.no_link, dirs=args.dir)
+    finally:
+        telemetry.write_report('media_dedup')
+
+
+if __name__ == '__main__':
+    main()
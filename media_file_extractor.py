@@ -1,33 +1,63 @@
 import subprocess
-import tkinter as tk
-from tkinter import ttk, messagebox, filedialog
 from datetime import datetime
 from pathlib import Path
 import os
 import re
-from PIL import Image, ImageTk
 import csv
 import mimetypes
-import tempfile
-import webbrowser
+import telemetry
+from content_query import build_query_command, combine_where, where_contains, where_date_range
 
+# tkinter and PIL are imported inside the GUI functions, so the query, parse and
+# filter helpers can be used headlessly without loading them.
+
+# Widgets, created by main()
+root = None
+tree = None
 summary_label = None
 preview_window = None
+start_entry = None
+end_entry = None
+folder_var = None
+folder_dropdown = None
+type_var = None
+
+
+MEDIA_COLUMNS = ['_data', '_display_name', 'date_added']
+MEDIA_URIS = [
+    'content://media/external/images/media',
+    'content://media/external/video/media',
+    'content://media/external/audio/media'
+]
+
+
+def build_media_where(start_date_str=None, end_date_str=None, folder_name=None, end_of_day=False):
+    """
+    Selection matching filter_by_date/filter_by_folder, evaluated on the device.
 
+    Like filter_by_date, the range stops at midnight of the end date unless end_of_day is set.
+    """
+    date_clause = None
+    if start_date_str and end_date_str:
+        date_clause = where_date_range('date_added', start_date_str, end_date_str, end_of_day=end_of_day)
+    return combine_where(date_clause, where_contains('_data', folder_name))
 
-def run_adb_query(uri):
+
+def run_adb_query(uri, where=None):
     try:
-        result = subprocess.run(
-            ['adb', 'shell', 'content', 'query', '--uri', uri,
-             '--projection', '_data:_display_name:date_added', '--user', '0'],
-            capture_output=True, text=True, encoding='utf-8', timeout=30
-        )
+        with telemetry.stage('adb.run_command') as st:
+            result = subprocess.run(
+                build_query_command(uri, projection=MEDIA_COLUMNS, where=where, sort='date_added DESC', user=0),
+                capture_output=True, text=True, encoding='utf-8', timeout=30
+            )
+            st.add(nbytes=telemetry.byte_len(result.stdout))
         return result.stdout if result.returncode == 0 else ""
     except Exception as e:
-        messagebox.showerror("ADB Error", str(e))
+        print(f"ADB Error: {e}")
         return ""
 
 
+@telemetry.timed('media.parse', rows=len)
 def parse_output(output):
     rows = []
     for line in output.strip().splitlines():
@@ -65,6 +95,22 @@ def filter_by_folder(rows, folder_name):
     return [row for row in rows if folder_name.lower() in row.get('_data', '').lower()]
 
 
+def format_date_added(row):
+    try:
+        return datetime.fromtimestamp(int(row.get('date_added', '0'))).strftime('%Y-%m-%d %H:%M:%S')
+    except:
+        return ''
+
+
+def save_media_csv(rows, filename):
+    with open(filename, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(['_data', '_display_name', 'date_added'])
+        for row in rows:
+            writer.writerow([row.get('_data', ''), row.get('_display_name', ''), format_date_added(row)])
+    print(f"Saved {len(rows)} media rows to {filename}")
+
+
 def pull_file(path, destination):
     if not path:
         return None
@@ -72,14 +118,18 @@ def pull_file(path, destination):
     dest_dir.mkdir(parents=True, exist_ok=True)
     filename = os.path.basename(path)
     local_path = dest_dir / filename
-    result = subprocess.run(['adb', 'pull', path, str(local_path)], capture_output=True, text=True)
-    if result.returncode != 0:
-        print(f"Error pulling {path}: {result.stderr.strip()}")
-        return None
+    with telemetry.stage('adb.pull') as st:
+        result = subprocess.run(['adb', 'pull', path, str(local_path)], capture_output=True, text=True)
+        if result.returncode != 0:
+            print(f"Error pulling {path}: {result.stderr.strip()}")
+            return None
+        st.add(rows=1, nbytes=local_path.stat().st_size)
     return str(local_path)
 
 
 def export_selected():
+    from tkinter import messagebox, filedialog
+
     selected = tree.selection()
     if not selected:
         messagebox.showwarning("No Selection", "Select at least one media to export.")
@@ -99,6 +149,8 @@ def export_selected():
 
 
 def export_csv():
+    from tkinter import messagebox, filedialog
+
     selected = tree.selection()
     if not selected:
         messagebox.showwarning("No Selection", "Select at least one media row to export to CSV.")
@@ -126,6 +178,10 @@ def update_summary(event=None):
 
 def preview_selected(event):
     global preview_window
+    import tkinter as tk
+    import webbrowser
+    from tkinter import messagebox
+    from PIL import Image, ImageTk
 
     selected = tree.focus()
     if not selected:
@@ -175,8 +231,16 @@ def deselect_all():
 
 
 def load_data():
+    import tkinter as tk
+    from tkinter import messagebox
+
     uri = type_var.get()
-    output = run_adb_query(uri)
+    start_date_str = start_entry.get()
+    end_date_str = end_entry.get()
+    selected_folder = folder_var.get()
+
+    # Filters are pushed down to the provider so only matching rows cross USB.
+    output = run_adb_query(uri, build_media_where(start_date_str, end_date_str, selected_folder))
     if not output:
         messagebox.showerror("ADB Query Failed", "No output received from ADB.")
         return
@@ -186,98 +250,98 @@ def load_data():
     tree.delete(*tree.get_children())
 
     data = parse_output(output)
-
-    start_date_str = start_entry.get()
-    end_date_str = end_entry.get()
     data = filter_by_date(data, start_date_str, end_date_str)
+    data = filter_by_folder(data, selected_folder)
 
-    # Populate dynamic folder filter
+    # Populate dynamic folder filter, keeping the current choice
     folders = sorted(set(Path(row['_data']).parts[-2] for row in data if '_data' in row))
+    if selected_folder and selected_folder != 'All' and selected_folder not in folders:
+        folders.append(selected_folder)
     folder_dropdown['values'] = ['All'] + folders
-    folder_dropdown.current(0)
-
-    selected_folder = folder_var.get()
-    data = filter_by_folder(data, selected_folder)
+    folder_var.set(selected_folder or 'All')
 
     if not data:
         messagebox.showwarning("No Data Found", "No media found from device in the specified filters.")
         return
 
     for item in data:
-        try:
-            timestamp = int(item.get('date_added', '0'))
-            date_str = datetime.fromtimestamp(timestamp).strftime('%Y-%m-%d %H:%M:%S')
-        except:
-            date_str = ''
-        tree.insert('', tk.END, values=(item.get('_data', ''), item.get('_display_name', ''), date_str))
+        tree.insert('', tk.END, values=(item.get('_data', ''), item.get('_display_name', ''), format_date_added(item)))
     update_summary()
 
     print(f"[DEBUG] Loaded {len(data)} records into table")
 
 
-# GUI Setup
-root = tk.Tk()
-root.title("ADB Media Extractor")
-root.geometry("1300x750")
+def main():
+    global root, tree, summary_label, start_entry, end_entry, folder_var, folder_dropdown, type_var
+    import tkinter as tk
+    from tkinter import ttk
 
-frame = ttk.Frame(root)
-frame.pack(fill=tk.BOTH, expand=True)
+    root = tk.Tk()
+    root.title("ADB Media Extractor")
+    root.geometry("1300x750")
 
-columns = ('_data', '_display_name', 'date_added')
-tree = ttk.Treeview(frame, columns=columns, show='headings', selectmode='extended')
-for col in columns:
-    tree.heading(col, text=col)
-    tree.column(col, width=400 if col == '_data' else 200)
-tree.pack(fill=tk.BOTH, expand=True, side=tk.LEFT)
+    frame = ttk.Frame(root)
+    frame.pack(fill=tk.BOTH, expand=True)
 
-tree.bind("<<TreeviewSelect>>", update_summary)
-tree.bind("<<TreeviewSelect>>", preview_selected)
+    columns = ('_data', '_display_name', 'date_added')
+    tree = ttk.Treeview(frame, columns=columns, show='headings', selectmode='extended')
+    for col in columns:
+        tree.heading(col, text=col)
+        tree.column(col, width=400 if col == '_data' else 200)
+    tree.pack(fill=tk.BOTH, expand=True, side=tk.LEFT)
 
-scroll = ttk.Scrollbar(frame, orient=tk.VERTICAL, command=tree.yview)
-tree.configure(yscrollcommand=scroll.set)
-scroll.pack(fill=tk.Y, side=tk.LEFT)
+    tree.bind("<<TreeviewSelect>>", update_summary)
+    tree.bind("<<TreeviewSelect>>", preview_selected)
 
-preview_label = tk.Label(root)
-preview_label.pack(pady=5)
+    scroll = ttk.Scrollbar(frame, orient=tk.VERTICAL, command=tree.yview)
+    tree.configure(yscrollcommand=scroll.set)
+    scroll.pack(fill=tk.Y, side=tk.LEFT)
 
-summary_label = tk.Label(root, text="Media Files: 0 selected of 0 total")
-summary_label.pack(pady=2)
+    preview_label = tk.Label(root)
+    preview_label.pack(pady=5)
 
-filter_frame = tk.Frame(root)
-filter_frame.pack(pady=5)
+    summary_label = tk.Label(root, text="Media Files: 0 selected of 0 total")
+    summary_label.pack(pady=2)
 
-tk.Label(filter_frame, text="Start Date (YYYY-MM-DD):").pack(side=tk.LEFT, padx=5)
-start_entry = tk.Entry(filter_frame, width=12)
-start_entry.pack(side=tk.LEFT)
+    filter_frame = tk.Frame(root)
+    filter_frame.pack(pady=5)
 
-tk.Label(filter_frame, text="End Date (YYYY-MM-DD):").pack(side=tk.LEFT, padx=5)
-end_entry = tk.Entry(filter_frame, width=12)
-end_entry.pack(side=tk.LEFT)
+    tk.Label(filter_frame, text="Start Date (YYYY-MM-DD):").pack(side=tk.LEFT, padx=5)
+    start_entry = tk.Entry(filter_frame, width=12)
+    start_entry.pack(side=tk.LEFT)
 
-tk.Label(filter_frame, text="Folder Filter:").pack(side=tk.LEFT, padx=5)
-folder_var = tk.StringVar()
-folder_dropdown = ttk.Combobox(filter_frame, textvariable=folder_var)
-folder_dropdown['values'] = ["All"]
-folder_dropdown.current(0)
-folder_dropdown.pack(side=tk.LEFT, padx=5)
+    tk.Label(filter_frame, text="End Date (YYYY-MM-DD):").pack(side=tk.LEFT, padx=5)
+    end_entry = tk.Entry(filter_frame, width=12)
+    end_entry.pack(side=tk.LEFT)
 
-tk.Label(filter_frame, text="Media Type:").pack(side=tk.LEFT, padx=5)
-type_var = tk.StringVar(value='content://media/external/images/media')
-type_dropdown = ttk.Combobox(filter_frame, textvariable=type_var, width=40)
-type_dropdown['values'] = [
-    'content://media/external/images/media',
-    'content://media/external/video/media',
-    'content://media/external/audio/media'
-]
-type_dropdown.pack(side=tk.LEFT, padx=5)
+    tk.Label(filter_frame, text="Folder Filter:").pack(side=tk.LEFT, padx=5)
+    folder_var = tk.StringVar()
+    folder_dropdown = ttk.Combobox(filter_frame, textvariable=folder_var)
+    folder_dropdown['values'] = ["All"]
+    folder_dropdown.current(0)
+    folder_dropdown.pack(side=tk.LEFT, padx=5)
+
+    tk.Label(filter_frame, text="Media Type:").pack(side=tk.LEFT, padx=5)
+    type_var = tk.StringVar(value='content://media/external/images/media')
+    type_dropdown = ttk.Combobox(filter_frame, textvariable=type_var, width=40)
+    type_dropdown['values'] = MEDIA_URIS
+    type_dropdown.pack(side=tk.LEFT, padx=5)
+
+    button_frame = tk.Frame(root)
+    button_frame.pack(pady=10)
 
-button_frame = tk.Frame(root)
-button_frame.pack(pady=10)
+    tk.Button(button_frame, text="Load Media", command=load_data).pack(side=tk.LEFT, padx=5)
+    tk.Button(button_frame, text="Select All", command=select_all).pack(side=tk.LEFT, padx=5)
+    tk.Button(button_frame, text="Deselect All", command=deselect_all).pack(side=tk.LEFT, padx=5)
+    tk.Button(button_frame, text="Export Selected", command=export_selected).pack(side=tk.LEFT, padx=5)
+    tk.Button(button_frame, text="Export CSV", command=export_csv).pack(side=tk.LEFT, padx=5)
+
+    telemetry.start()
+    try:
+        root.mainloop()
+    finally:
+        telemetry.write_report('media_file_extractor')
 
-tk.Button(button_frame, text="Load Media", command=load_data).pack(side=tk.LEFT, padx=5)
-tk.Button(button_frame, text="Select All", command=select_all).pack(side=tk.LEFT, padx=5)
-tk.Button(button_frame, text="Deselect All", command=deselect_all).pack(side=tk.LEFT, padx=5)
-tk.Button(button_frame, text="Export Selected", command=export_selected).pack(side=tk.LEFT, padx=5)
-tk.Button(button_frame, text="Export CSV", command=export_csv).pack(side=tk.LEFT, padx=5)
 
-root.mainloop()
+if __name__ == '__main__':
+    main()
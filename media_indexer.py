@@ -0,0 +1,286 @@
+import os
+import math
+import sqlite3
+import argparse
+from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor
+import telemetry
+
+DEFAULT_INDEX = os.path.join("extracted", "media_index.db")
+IMAGE_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.webp', '.gif', '.bmp', '.tif', '.tiff'}
+
+EXIF_IFD = 0x8769
+GPS_IFD = 0x8825
+TAG_MAKE = 271
+TAG_MODEL = 272
+TAG_DATETIME = 306
+TAG_DATETIME_ORIGINAL = 36867
+
+# Within 7 bits of a 64-bit hash, at least one of the eight 8-bit bands matches exactly.
+HASH_BANDS = 8
+BAND_BITS = 8
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS media (
+    path TEXT PRIMARY KEY,
+    size INTEGER,
+    mtime INTEGER,
+    width INTEGER,
+    height INTEGER,
+    format TEXT,
+    taken_at TEXT,
+    make TEXT,
+    model TEXT,
+    lat REAL,
+    lon REAL,
+    ahash INTEGER,
+    dhash INTEGER,
+    b0 INTEGER, b1 INTEGER, b2 INTEGER, b3 INTEGER,
+    b4 INTEGER, b5 INTEGER, b6 INTEGER, b7 INTEGER
+);
+CREATE INDEX IF NOT EXISTS media_latlon ON media(lat, lon);
+CREATE INDEX IF NOT EXISTS media_b0 ON media(b0);
+CREATE INDEX IF NOT EXISTS media_b1 ON media(b1);
+CREATE INDEX IF NOT EXISTS media_b2 ON media(b2);
+CREATE INDEX IF NOT EXISTS media_b3 ON media(b3);
+CREATE INDEX IF NOT EXISTS media_b4 ON media(b4);
+CREATE INDEX IF NOT EXISTS media_b5 ON media(b5);
+CREATE INDEX IF NOT EXISTS media_b6 ON media(b6);
+CREATE INDEX IF NOT EXISTS media_b7 ON media(b7);
+"""
+
+
+def _to_signed(value):
+    """SQLite integers are signed 64-bit."""
+    return value - (1 << 64) if value >= (1 << 63) else value
+
+
+def _to_unsigned(value):
+    return value + (1 << 64) if value < 0 else value
+
+
+def hash_bands(value):
+    value = _to_unsigned(value)
+    mask = (1 << BAND_BITS) - 1
+    return [(value >> (BAND_BITS * i)) & mask for i in range(HASH_BANDS)]
+
+
+def hamming(a, b):
+    return bin(_to_unsigned(a) ^ _to_unsigned(b)).count('1')
+
+
+def average_hash(gray):
+    from PIL import Image
+    pixels = list(gray.resize((8, 8), Image.BILINEAR).getdata())
+    mean = sum(pixels) / len(pixels)
+    value = 0
+    for p in pixels:
+        value = (value << 1) | (p > mean)
+    return value
+
+
+def difference_hash(gray):
+    from PIL import Image
+    pixels = list(gray.resize((9, 8), Image.BILINEAR).getdata())
+    value = 0
+    for row in range(8):
+        for col in range(8):
+            value = (value << 1) | (pixels[row * 9 + col] > pixels[row * 9 + col + 1])
+    return value
+
+
+def _gps_to_degrees(values, ref):
+    try:
+        d, m, s = (float(v) for v in values)
+    except (TypeError, ValueError, ZeroDivisionError):
+        return None
+    degrees = d + m / 60 + s / 3600
+    return -degrees if ref in ('S', 'W') else degrees
+
+
+def _exif_fields(img):
+    """Read capture time, camera and GPS from the EXIF header without decoding pixels."""
+    exif = img.getexif()
+    if not exif:
+        return None, None, None, None, None
+    taken = exif.get_ifd(EXIF_IFD).get(TAG_DATETIME_ORIGINAL) or exif.get(TAG_DATETIME)
+    taken_at = None
+    if taken:
+        try:
+            taken_at = datetime.strptime(str(taken).strip('\x00'), '%Y:%m:%d %H:%M:%S').isoformat()
+        except ValueError:
+            taken_at = None
+    lat = lon = None
+    gps = exif.get_ifd(GPS_IFD)
+    if gps and 2 in gps and 4 in gps:
+        lat = _gps_to_degrees(gps[2], gps.get(1))
+        lon = _gps_to_degrees(gps[4], gps.get(3))
+    make = str(exif.get(TAG_MAKE)).strip('\x00 ') if exif.get(TAG_MAKE) else None
+    model = str(exif.get(TAG_MODEL)).strip('\x00 ') if exif.get(TAG_MODEL) else None
+    return taken_at, make, model, lat, lon
+
+
+def index_file(path):
+    """Return an index row for one image, or None if PIL cannot read it. Runs in a worker process."""
+    from PIL import Image
+    try:
+        stat = os.stat(path)
+        with Image.open(path) as img:
+            width, height = img.size
+            fmt = img.format
+            taken_at, make, model, lat, lon = _exif_fields(img)
+            # JPEG can decode at a reduced scale, which is all the hashes need.
+            img.draft('L', (64, 64))
+            gray = img.convert('L')
+            ahash = average_hash(gray)
+            dhash = difference_hash(gray)
+    except Exception as e:
+        print(f"Skipping {path}: {e}")
+        return None
+    return (path, stat.st_size, int(stat.st_mtime), width, height, fmt, taken_at, make, model,
+            lat, lon, _to_signed(ahash), _to_signed(dhash), *hash_bands(dhash))
+
+
+def open_index(index_path=DEFAULT_INDEX):
+    directory = os.path.dirname(index_path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    conn = sqlite3.connect(index_path)
+    columns = {row[1] for row in conn.execute("PRAGMA table_info(media)")}
+    if columns and f"b{HASH_BANDS - 1}" not in columns:
+        # Index written with the older 4x16-bit bands; it is only a cache, so rebuild it.
+        print(f"Rebuilding {index_path} for the new hash bands")
+        conn.execute("DROP TABLE media")
+    conn.executescript(SCHEMA)
+    return conn
+
+
+def find_images(root_dir):
+    for root, _, files in os.walk(root_dir):
+        for name in files:
+            if os.path.splitext(name)[1].lower() in IMAGE_EXTENSIONS:
+                yield os.path.join(root, name)
+
+
+@telemetry.timed('media.index', rows=int)
+def build_index(root_dir, index_path=DEFAULT_INDEX, workers=None, mp_context=None):
+    """
+    Index every image under root_dir using a process pool.
+
+    mp_context is passed to the pool; callers running other work in threads should
+    pass a spawn context.
+
+    Files whose size and mtime match the existing index entry are skipped.
+    Returns the number of files (re)indexed.
+    """
+    conn = open_index(index_path)
+    known = {path: (size, mtime) for path, size, mtime in conn.execute("SELECT path, size, mtime FROM media")}
+    todo = []
+    for path in find_images(root_dir):
+        try:
+            stat = os.stat(path)
+        except OSError:
+            continue
+        if known.get(path) != (stat.st_size, int(stat.st_mtime)):
+            todo.append(path)
+
+    indexed = 0
+    if todo:
+        with ProcessPoolExecutor(max_workers=workers, mp_context=mp_context) as pool:
+            rows = (row for row in pool.map(index_file, todo, chunksize=64) if row)
+            with conn:
+                for row in rows:
+                    conn.execute("INSERT OR REPLACE INTO media VALUES (?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?)", row)
+                    indexed += 1
+    conn.close()
+    print(f"Indexed {indexed} images ({len(todo) - indexed} unreadable) into {index_path}")
+    return indexed
+
+
+def _haversine_km(lat1, lon1, lat2, lon2):
+    lat1, lon1, lat2, lon2 = map(math.radians, (lat1, lon1, lat2, lon2))
+    a = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+    return 6371.0 * 2 * math.asin(math.sqrt(a))
+
+
+def find_near(lat, lon, radius_km=1.0, index_path=DEFAULT_INDEX):
+    """Return [(distance_km, path, taken_at)] within radius_km, nearest first."""
+    dlat = radius_km / 111.0
+    dlon = radius_km / max(111.0 * math.cos(math.radians(lat)), 1e-6)
+    conn = open_index(index_path)
+    rows = conn.execute(
+        "SELECT path, lat, lon, taken_at FROM media WHERE lat BETWEEN ? AND ? AND lon BETWEEN ? AND ?",
+        (lat - dlat, lat + dlat, lon - dlon, lon + dlon)
+    ).fetchall()
+    conn.close()
+    matches = []
+    for path, plat, plon, taken_at in rows:
+        distance = _haversine_km(lat, lon, plat, plon)
+        if distance <= radius_km:
+            matches.append((distance, path, taken_at))
+    return sorted(matches)
+
+
+def find_similar(image_path, max_distance=6, index_path=DEFAULT_INDEX):
+    """
+    Return [(distance, path)] of images whose dHash is within max_distance bits.
+
+    Up to 7 bits, one of the eight 8-bit bands must match exactly, so the band
+    indexes narrow the search; larger distances scan the hash column.
+    """
+    row = index_file(image_path)
+    if not row:
+        return []
+    target = row[12]
+    conn = open_index(index_path)
+    if max_distance < HASH_BANDS:
+        bands = hash_bands(target)
+        candidates = conn.execute(
+            "SELECT path, dhash FROM media WHERE " + " OR ".join(f"b{i}=?" for i in range(HASH_BANDS)), bands
+        ).fetchall()
+    else:
+        candidates = conn.execute("SELECT path, dhash FROM media").fetchall()
+    conn.close()
+    matches = []
+    for path, dhash in candidates:
+        distance = hamming(target, dhash)
+        if distance <= max_distance and os.path.abspath(path) != os.path.abspath(image_path):
+            matches.append((distance, path))
+    return sorted(matches)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Index pulled media by EXIF data and perceptual hash")
+    parser.add_argument('--index', default=DEFAULT_INDEX, help="Index database path")
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    p_index = sub.add_parser('index', help="Index images under a directory")
+    p_index.add_argument('directory', nargs='?', default='extracted')
+    p_index.add_argument('--workers', type=int, help="Worker processes (default: CPU count)")
+
+    p_near = sub.add_parser('near', help="Images taken near a location")
+    p_near.add_argument('lat', type=float)
+    p_near.add_argument('lon', type=float)
+    p_near.add_argument('--radius', type=float, default=1.0, help="Radius in km")
+
+    p_similar = sub.add_parser('similar', help="Images visually similar to a given image")
+    p_similar.add_argument('image')
+    p_similar.add_argument('--distance', type=int, default=6, help="Maximum differing hash bits")
+
+    args = parser.parse_args()
+    telemetry.start()
+    try:
+        if args.command == 'index':
+            build_index(args.directory, args.index, args.workers)
+        elif args.command == 'near':
+            for distance, path, taken_at in find_near(args.lat, args.lon, args.radius, args.index):
+                print(f"{distance:8.3f} km  {taken_at or '':19}  {path}")
+        else:
+            for distance, path in find_similar(args.image, args.distance, args.index):
+                print(f"{distance:3d}  {path}")
+    finally:
+        telemetry.write_report('media_indexer')
+
+
+if __name__ == '__main__':
+    main()
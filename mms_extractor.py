@@ -0,0 +1,315 @@
+import os
+import re
+import csv
+import json
+import hashlib
+import argparse
+import mimetypes
+import tempfile
+import subprocess
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+import telemetry
+from adb_sms_extractor import run_command, get_sms_type_label
+from content_query import build_query_command, date_arg, where_date_range
+
+MMS_COLUMNS = ['_id', 'thread_id', 'date', 'msg_box', 'm_type', 'read', 'sub']
+PART_COLUMNS = ['_id', 'mid', 'seq', 'ct', 'name', 'cl', 'text']
+ADDR_COLUMNS = ['msg_id', 'type', 'address']
+ADDR_TYPES = {'137': 'from', '151': 'to', '130': 'cc', '129': 'bcc'}
+# Parts whose content is already in the `text` column; everything else is fetched.
+INLINE_TYPES = ('text/plain', 'application/smil')
+
+DEFAULT_OUTPUT = "mms"
+MANIFEST_NAME = ".mms_manifest.json"
+QUERY_TIMEOUT = 300
+ADDR_BATCH = 40
+PART_BATCH = 500
+FETCH_WORKERS = 8
+READ_CHUNK = 1024 * 1024
+
+ROW_START = re.compile(r'^Row: \d+ ', re.M)
+NO_RESULT = re.compile(r'^No result found\.\n?', re.M)
+
+
+def parse_rows(output, columns):
+    """
+    Parse `content query` output for a known projection into dicts.
+
+    Values can contain ", " and newlines (MMS text often does), so fields are split only
+    in front of the projected column names, and the last column takes the rest of the row.
+    """
+    if not output:
+        return []
+    output = NO_RESULT.sub('', output)
+    field_start = re.compile(r', (?=(?:' + '|'.join(map(re.escape, columns)) + r')=)')
+    rows = []
+    for chunk in ROW_START.split(output)[1:]:
+        row = {}
+        for field in field_start.split(chunk.rstrip('\n'), maxsplit=len(columns) - 1):
+            key, _, value = field.partition('=')
+            row[key] = None if value == 'NULL' else value
+        rows.append(row)
+    return rows
+
+
+@telemetry.timed('mms.query', rows=len)
+def get_mms_messages(start_date=None, end_date=None):
+    """All MMS headers in one query; MMS `date` is in seconds."""
+    where = where_date_range('date', start_date, end_date)
+    command = build_query_command('content://mms', projection=MMS_COLUMNS, where=where, sort='date DESC')
+    return parse_rows(run_command(command, timeout=QUERY_TIMEOUT), MMS_COLUMNS)
+
+
+def _query_part_batch(message_ids):
+    where = f"mid IN ({','.join(str(int(mid)) for mid in message_ids)})" if message_ids is not None else None
+    command = build_query_command('content://mms/part', projection=PART_COLUMNS, where=where, sort='mid, seq')
+    return parse_rows(run_command(command, timeout=QUERY_TIMEOUT), PART_COLUMNS)
+
+
+@telemetry.timed('mms.query_parts', rows=len)
+def get_mms_parts(message_ids=None, workers=FETCH_WORKERS):
+    """
+    Metadata and inline text of MMS parts (not the attachment data).
+
+    Without message_ids every part comes back in one query; otherwise the parts of
+    those messages are selected on the device, PART_BATCH messages per query.
+    """
+    if message_ids is None:
+        return _query_part_batch(None)
+    batches = [message_ids[i:i + PART_BATCH] for i in range(0, len(message_ids), PART_BATCH)]
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        return [part for batch in pool.map(_query_part_batch, batches) for part in batch]
+
+
+def _query_addr_batch(message_ids):
+    """Run the per-message addr queries for a batch in a single `adb shell` call."""
+    script = ' ; '.join(f"content query --uri content://mms/{mid}/addr --projection {':'.join(ADDR_COLUMNS)}"
+                        for mid in message_ids)
+    return parse_rows(run_command(['adb', 'shell', script], timeout=QUERY_TIMEOUT), ADDR_COLUMNS)
+
+
+@telemetry.timed('mms.query_addr')
+def get_mms_addresses(message_ids, workers=FETCH_WORKERS):
+    """
+    Return {msg_id: [(kind, address)]} for the given messages.
+
+    The provider only serves addr as content://mms/<id>/addr, so the per-message
+    queries are chained ADDR_BATCH at a time into one shell call, with several
+    calls in flight.
+    """
+    batches = [message_ids[i:i + ADDR_BATCH] for i in range(0, len(message_ids), ADDR_BATCH)]
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        rows = [row for batch_rows in pool.map(_query_addr_batch, batches) for row in batch_rows]
+    telemetry.count('mms.query_addr', rows=len(rows))
+
+    wanted = set(message_ids)
+    addresses = {}
+    for row in rows:
+        if row.get('msg_id') in wanted and row.get('address') and row['address'] != 'insert-address-token':
+            addresses.setdefault(row['msg_id'], []).append((ADDR_TYPES.get(row.get('type'), 'other'), row['address']))
+    return addresses
+
+
+def _part_filename(part):
+    name = part.get('cl') or part.get('name') or ''
+    name = re.sub(r'[^\w.\-]', '_', name).strip('._')
+    if not os.path.splitext(name)[1]:
+        name += mimetypes.guess_extension(part.get('ct') or '') or '.bin'
+    return f"{part['_id']}_{name}"
+
+
+def fetch_part(part_id, dest_path):
+    """
+    Stream one part's data into dest_path with `adb exec-out content read`, hashing it
+    on the way. Returns (sha256, size), or None if the device returned nothing.
+    """
+    os.makedirs(os.path.dirname(dest_path), exist_ok=True)
+    tmp_path = dest_path + '.tmp'
+    digest = hashlib.sha256()
+    size = 0
+    proc = None
+    # stderr goes to a file so a chatty adb cannot block on a full pipe while stdout is read.
+    with tempfile.TemporaryFile() as err:
+        try:
+            with telemetry.stage('adb.read_part') as st, open(tmp_path, 'wb') as f:
+                proc = subprocess.Popen(['adb', 'exec-out', 'content', 'read', '--uri', f'content://mms/part/{part_id}'],
+                                        stdout=subprocess.PIPE, stderr=err)
+                for chunk in iter(lambda: proc.stdout.read(READ_CHUNK), b''):
+                    digest.update(chunk)
+                    f.write(chunk)
+                    size += len(chunk)
+                proc.wait()
+                st.add(nbytes=size)
+            if proc.returncode != 0 or size == 0:
+                err.seek(0)
+                print(f"Error reading MMS part {part_id}: {err.read().decode('utf-8', 'replace').strip() or 'no data'}")
+                return None
+            os.replace(tmp_path, dest_path)
+            return digest.hexdigest(), size
+        except Exception as e:
+            print(f"Error reading MMS part {part_id}: {e}")
+            return None
+        finally:
+            if proc is not None:
+                if proc.poll() is None:
+                    proc.kill()
+                    proc.wait()
+                proc.stdout.close()
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+
+def load_manifest(output_dir):
+    try:
+        with open(os.path.join(output_dir, MANIFEST_NAME), 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_manifest(output_dir, manifest):
+    path = os.path.join(output_dir, MANIFEST_NAME)
+    with open(path + '.tmp', 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=1, sort_keys=True)
+    os.replace(path + '.tmp', path)
+
+
+@telemetry.timed('mms.fetch_parts')
+def fetch_attachments(parts, output_dir, workers=FETCH_WORKERS):
+    """
+    Fetch the data of non-text parts in parallel into output_dir/attachments/<mid>/.
+
+    Parts already fetched in an earlier run (same id, file still there with the
+    recorded size) are not read again. Returns a list of attachment records.
+    """
+    manifest = load_manifest(output_dir)
+    records = []
+    todo = []
+    for part in parts:
+        if (part.get('ct') or '').lower() in INLINE_TYPES:
+            continue
+        path = os.path.join(output_dir, 'attachments', part['mid'], _part_filename(part))
+        known = manifest.get(part['_id'])
+        record = {'message_id': part['mid'], 'part_id': part['_id'], 'content_type': part.get('ct') or '',
+                  'name': part.get('cl') or part.get('name') or '', 'path': path}
+        if known and os.path.isfile(path) and os.path.getsize(path) == known['size']:
+            record.update(sha256=known['sha256'], size=known['size'])
+        else:
+            todo.append(record)
+        records.append(record)
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        results = pool.map(lambda r: fetch_part(r['part_id'], r['path']), todo)
+        for record, result in zip(todo, results):
+            record['sha256'], record['size'] = result or ('', 0)
+            if result:
+                manifest[record['part_id']] = {'sha256': result[0], 'size': result[1]}
+    save_manifest(output_dir, manifest)
+    telemetry.count('mms.fetch_parts', rows=len(todo), nbytes=sum(r['size'] for r in todo))
+    print(f"MMS attachments: {len(todo)} fetched, {len(records) - len(todo)} unchanged")
+    return [r for r in records if r['sha256']]
+
+
+def build_message_records(messages, parts, addresses, attachments):
+    """Join headers, addresses, text parts and attachment hashes into one record per message."""
+    texts = {}
+    for part in parts:
+        if (part.get('ct') or '').lower() == 'text/plain' and part.get('text'):
+            texts.setdefault(part['mid'], []).append(part['text'])
+    hashes = {}
+    for attachment in attachments:
+        hashes.setdefault(attachment['message_id'], []).append(attachment['sha256'])
+
+    records = []
+    for msg in messages:
+        addrs = addresses.get(msg['_id'], [])
+        records.append({
+            'id': msg['_id'],
+            'thread_id': msg.get('thread_id') or '',
+            'date': msg.get('date') or '',
+            'box': msg.get('msg_box') or '',
+            'from': ';'.join(a for kind, a in addrs if kind == 'from'),
+            'to': ';'.join(a for kind, a in addrs if kind != 'from'),
+            'subject': msg.get('sub') or '',
+            'text': '\n'.join(texts.get(msg['_id'], [])),
+            'attachments': hashes.get(msg['_id'], [])
+        })
+    return records
+
+
+def _format_date(seconds):
+    try:
+        return datetime.fromtimestamp(int(seconds)).strftime('%Y-%m-%d %H:%M:%S')
+    except (TypeError, ValueError):
+        return seconds or ''
+
+
+@telemetry.timed('mms.write_csv')
+def save_mms(records, attachments, output_dir):
+    """Write mms_messages.csv and mms_attachments.csv, linked by message id and sha256."""
+    telemetry.count('mms.write_csv', rows=len(records))
+    messages_path = os.path.join(output_dir, 'mms_messages.csv')
+    with open(messages_path, 'w', newline='', encoding='utf-8-sig') as f:
+        writer = csv.writer(f)
+        writer.writerow(['ID', 'Thread', 'Date', 'Box', 'From', 'To', 'Subject', 'Text', 'Attachments'])
+        for r in records:
+            writer.writerow([r['id'], r['thread_id'], _format_date(r['date']), get_sms_type_label(r['box']),
+                             r['from'], r['to'], r['subject'], r['text'], ';'.join(r['attachments'])])
+
+    attachments_path = os.path.join(output_dir, 'mms_attachments.csv')
+    with open(attachments_path, 'w', newline='', encoding='utf-8-sig') as f:
+        writer = csv.writer(f)
+        writer.writerow(['Message ID', 'Part ID', 'Content Type', 'Name', 'Size', 'SHA-256', 'Path'])
+        for a in attachments:
+            writer.writerow([a['message_id'], a['part_id'], a['content_type'], a['name'], a['size'],
+                             a['sha256'], a['path']])
+    print(f"Saved {len(records)} MMS to {messages_path} and {len(attachments)} attachments to {attachments_path}")
+
+
+def extract_mms(start_date=None, end_date=None, contact=None, output_dir=DEFAULT_OUTPUT, workers=FETCH_WORKERS):
+    """Extract MMS messages and their attachments into output_dir. Returns the message records."""
+    os.makedirs(output_dir, exist_ok=True)
+    messages = get_mms_messages(start_date, end_date)
+    if not messages:
+        print("No MMS found")
+        return []
+    addresses = get_mms_addresses([m['_id'] for m in messages], workers)
+    if contact:
+        messages = [m for m in messages if any(contact in a for _, a in addresses.get(m['_id'], []))]
+
+    # Unfiltered runs read the whole part table in one query; filtered runs only their messages' parts.
+    filtered = start_date or end_date or contact
+    wanted = {m['_id'] for m in messages}
+    parts = [p for p in get_mms_parts([m['_id'] for m in messages] if filtered else None, workers)
+             if p.get('mid') in wanted]
+    attachments = fetch_attachments(parts, output_dir, workers)
+    records = build_message_records(messages, parts, addresses, attachments)
+    save_mms(records, attachments, output_dir)
+    return records
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Extract MMS messages and attachments over ADB")
+    parser.add_argument('--start-date', type=date_arg, help="Only messages on or after this date (YYYY-MM-DD)")
+    parser.add_argument('--end-date', type=date_arg, help="Only messages up to this date (YYYY-MM-DD)")
+    parser.add_argument('--contact', help="Only messages with an address containing this text")
+    parser.add_argument('--output', default=DEFAULT_OUTPUT, help="Output directory")
+    parser.add_argument('--workers', type=int, default=FETCH_WORKERS, help="Parallel adb calls")
+    parser.add_argument('--profile', action='store_true', help="Include a cProfile summary in the timing report")
+    parser.add_argument('--trace-memory', action='store_true', help="Include a tracemalloc snapshot in the timing report")
+    args = parser.parse_args()
+
+    telemetry.start(profile=args.profile or None, trace_memory=args.trace_memory or None)
+    try:
+        devices = run_command(['adb', 'devices'])
+        if not devices or 'device' not in devices.split('\n', 1)[-1]:
+            print("No device connected or unauthorized")
+            return
+        extract_mms(args.start_date, args.end_date, args.contact, args.output, args.workers)
+    finally:
+        telemetry.write_report('mms_extractor')
+
+
+if __name__ == '__main__':
+    main()
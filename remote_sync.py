@@ -0,0 +1,185 @@
+import os
+import json
+import shlex
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+import telemetry
+
+MANIFEST_NAME = ".sync_manifest.json"
+PULL_BATCH_SIZE = 64
+DEFAULT_WORKERS = 4
+LIST_TIMEOUT = 300
+
+
+def list_remote_tree(remote_root):
+    """
+    List every file under remote_root with one `find ... stat` call on the device.
+
+    Returns {remote_path: (size, mtime)}; an empty dict if the path is missing, and
+    None if the listing failed or may be incomplete, so it is never used to prune.
+    """
+    script = f"find {shlex.quote(remote_root)} -type f -exec stat -c '%s %Y %n' {{}} +"
+    try:
+        with telemetry.stage('adb.list_tree') as st:
+            result = subprocess.run(['adb', 'shell', script], capture_output=True, text=True,
+                                    encoding='utf-8', errors='replace', timeout=LIST_TIMEOUT)
+            st.add(nbytes=telemetry.byte_len(result.stdout))
+    except Exception as e:
+        print(f"Listing {remote_root} failed: {e}")
+        return None
+    if result.returncode != 0:
+        if not result.stdout.strip() and 'No such file' in result.stderr:
+            return {}
+        print(f"Listing {remote_root} failed: {result.stderr.strip() or f'exit code {result.returncode}'}")
+        return None
+
+    listing = {}
+    for line in result.stdout.splitlines():
+        parts = line.split(' ', 2)
+        if len(parts) != 3 or not parts[0].isdigit() or not parts[1].isdigit():
+            continue
+        listing[parts[2]] = (int(parts[0]), int(parts[1]))
+    return listing
+
+
+def load_manifest(local_root):
+    path = os.path.join(local_root, MANIFEST_NAME)
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_manifest(local_root, manifest):
+    path = os.path.join(local_root, MANIFEST_NAME)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=1, sort_keys=True)
+    os.replace(tmp_path, path)
+
+
+def _local_path(remote_path, remote_root, local_root):
+    """Mirror `adb pull remote_root local_root`: files land under local_root/<basename of remote_root>."""
+    rel = os.path.relpath(remote_path, remote_root)
+    base = os.path.basename(remote_root.rstrip('/'))
+    return os.path.join(local_root, base, *rel.split('/'))
+
+
+def plan_pulls(listing, remote_root, local_root, manifest):
+    """Return [(remote_path, local_path, size, mtime)] for files that are new or changed."""
+    pulls = []
+    for remote_path, (size, mtime) in listing.items():
+        local_path = _local_path(remote_path, remote_root, local_root)
+        known = manifest.get(remote_path)
+        if known and known == [size, mtime] and os.path.isfile(local_path) \
+                and os.path.getsize(local_path) == size:
+            continue
+        pulls.append((remote_path, local_path, size, mtime))
+    return pulls
+
+
+def _pull_batch(local_dir, remote_paths):
+    """Pull remote_paths into local_dir with one `adb pull -a`; returns False if adb reported an error."""
+    os.makedirs(local_dir, exist_ok=True)
+    with telemetry.stage('adb.pull'):
+        result = subprocess.run(['adb', 'pull', '-a', *remote_paths, local_dir], capture_output=True, text=True)
+    if result.returncode != 0:
+        print(f"Error pulling into {local_dir}: {result.stderr.strip()}")
+        return False
+    return True
+
+
+def pull_files(pulls):
+    """
+    Pull files grouped by destination directory, several sources per `adb pull`.
+
+    Returns the set of remote paths whose batch failed.
+    """
+    by_dir = {}
+    for remote_path, local_path, _, _ in pulls:
+        # adb pull writes into an existing file, which would change every hardlinked copy of it.
+        if os.path.isfile(local_path) and os.stat(local_path).st_nlink > 1:
+            os.remove(local_path)
+        by_dir.setdefault(os.path.dirname(local_path), []).append(remote_path)
+
+    failed = set()
+    for local_dir, remote_paths in by_dir.items():
+        for i in range(0, len(remote_paths), PULL_BATCH_SIZE):
+            batch = remote_paths[i:i + PULL_BATCH_SIZE]
+            if not _pull_batch(local_dir, batch):
+                failed.update(batch)
+    return failed
+
+
+def sync_tree(remote_root, local_root, listing=None):
+    """
+    Pull only the files under remote_root that changed since the last sync into local_root.
+
+    The layout matches a plain `adb pull remote_root local_root`. A manifest of remote
+    sizes and mtimes kept in local_root decides what is unchanged. A pulled file only
+    counts once its batch succeeded and it has the remote size and mtime (`pull -a`
+    keeps the mtime). If the tree cannot be listed nothing is pulled or pruned.
+    Returns a stats dict.
+    """
+    os.makedirs(local_root, exist_ok=True)
+    if listing is None:
+        listing = list_remote_tree(remote_root)
+    if listing is None:
+        print(f"Skipping {remote_root}: the listing failed, manifest left as it was")
+        return {'remote_root': remote_root, 'files': 0, 'unchanged': 0, 'pulled': 0, 'failed': 0,
+                'bytes': 0, 'listing_failed': True}
+    manifest = load_manifest(local_root)
+    pulls = plan_pulls(listing, remote_root, local_root, manifest)
+
+    failed_batches = pull_files(pulls) if pulls else set()
+
+    pulled = failed = pulled_bytes = 0
+    for remote_path, local_path, size, mtime in pulls:
+        if remote_path not in failed_batches and os.path.isfile(local_path) \
+                and os.path.getsize(local_path) == size and int(os.path.getmtime(local_path)) == mtime:
+            manifest[remote_path] = [size, mtime]
+            pulled += 1
+            pulled_bytes += size
+        else:
+            manifest.pop(remote_path, None)
+            failed += 1
+    for remote_path in list(manifest):
+        if remote_path not in listing and remote_path.startswith(remote_root.rstrip('/') + '/'):
+            del manifest[remote_path]
+    save_manifest(local_root, manifest)
+    telemetry.count('adb.pull', rows=pulled, nbytes=pulled_bytes)
+
+    stats = {
+        'remote_root': remote_root,
+        'files': len(listing),
+        'unchanged': len(listing) - len(pulls),
+        'pulled': pulled,
+        'failed': failed,
+        'bytes': pulled_bytes
+    }
+    print(f"Synced {remote_root}: {pulled} pulled, {stats['unchanged']} unchanged, {failed} failed")
+    return stats
+
+
+def sync_trees(jobs, workers=DEFAULT_WORKERS):
+    """Run sync_tree for each (remote_root, local_root[, listing]) job in parallel."""
+    if not jobs:
+        return []
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(lambda job: sync_tree(*job), jobs))
+
+
+def split_listing(listing, remote_root):
+    """Group a listing of remote_root by its immediate subfolder."""
+    prefix = remote_root.rstrip('/') + '/'
+    groups = {}
+    for remote_path, info in listing.items():
+        if not remote_path.startswith(prefix):
+            continue
+        rest = remote_path[len(prefix):]
+        if '/' not in rest:
+            continue
+        folder = rest.split('/', 1)[0]
+        groups.setdefault(folder, {})[remote_path] = info
+    return groups
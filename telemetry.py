@@ -0,0 +1,192 @@
+import os
+import io
+import sys
+import json
+import time
+import argparse
+import threading
+import tracemalloc
+from datetime import datetime
+from functools import wraps
+from contextlib import contextmanager
+
+REPORT_DIR = os.environ.get('TRIAGE_TELEMETRY_DIR', 'telemetry')
+TOP_N = 25
+
+_lock = threading.Lock()
+_stages = {}
+_started = time.perf_counter()
+_profiler = None
+
+
+class StageHandle:
+    """Lets code inside a stage report how many rows and bytes it handled."""
+
+    def __init__(self):
+        self.rows = 0
+        self.bytes = 0
+
+    def add(self, rows=0, nbytes=0):
+        self.rows += rows
+        self.bytes += nbytes
+
+
+def _record(name, seconds, rows, nbytes, calls=1):
+    with _lock:
+        entry = _stages.setdefault(name, {'calls': 0, 'seconds': 0.0, 'rows': 0, 'bytes': 0})
+        entry['calls'] += calls
+        entry['seconds'] += seconds
+        entry['rows'] += rows
+        entry['bytes'] += nbytes
+
+
+@contextmanager
+def stage(name):
+    """Time a block under `name`; stages with the same name accumulate."""
+    handle = StageHandle()
+    start = time.perf_counter()
+    try:
+        yield handle
+    finally:
+        _record(name, time.perf_counter() - start, handle.rows, handle.bytes)
+
+
+def timed(name, rows=None):
+    """Decorator form of stage(); `rows` maps the return value to a row count (e.g. len)."""
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            with stage(name) as st:
+                result = func(*args, **kwargs)
+                if rows is not None and result is not None:
+                    st.add(rows=rows(result))
+                return result
+        return wrapper
+    return decorator
+
+
+def byte_len(text):
+    """Size of decoded command output in bytes, for st.add(nbytes=...)."""
+    return len(text.encode('utf-8', 'replace')) if text else 0
+
+
+def record(name, seconds, rows=0, nbytes=0):
+    """Add a duration measured elsewhere, e.g. around work done in another process."""
+    _record(name, seconds, rows, nbytes)
+
+
+def merge(stages):
+    """Add the stages of a snapshot() taken in another process to this run."""
+    for name, entry in stages.items():
+        _record(name, entry['seconds'], entry['rows'], entry['bytes'], calls=entry['calls'])
+
+
+def count(name, rows=0, nbytes=0):
+    """Add rows/bytes to a stage without timing anything."""
+    _record(name, 0.0, rows, nbytes, calls=0)
+
+
+def start(profile=None, trace_memory=None):
+    """
+    Begin a run. cProfile and tracemalloc are off unless asked for, either here or
+    through TRIAGE_PROFILE=1 / TRIAGE_TRACE_MEMORY=1. cProfile only sees the calling thread.
+    """
+    global _started, _profiler
+    if profile is None:
+        profile = os.environ.get('TRIAGE_PROFILE') == '1'
+    if trace_memory is None:
+        trace_memory = os.environ.get('TRIAGE_TRACE_MEMORY') == '1'
+    with _lock:
+        _stages.clear()
+    _started = time.perf_counter()
+    if trace_memory and not tracemalloc.is_tracing():
+        tracemalloc.start()
+    if profile:
+        import cProfile
+        _profiler = cProfile.Profile()
+        _profiler.enable()
+
+
+def _profile_summary():
+    global _profiler
+    if not _profiler:
+        return None
+    import pstats
+    _profiler.disable()
+    stats = pstats.Stats(_profiler, stream=io.StringIO()).sort_stats('cumulative')
+    top = []
+    for (filename, line, func), (_, ncalls, tottime, cumtime, _) in list(stats.stats.items()):
+        top.append({'function': f"{os.path.basename(filename)}:{line}({func})", 'calls': ncalls,
+                    'tottime': tottime, 'cumtime': cumtime})
+    _profiler = None
+    return sorted(top, key=lambda row: row['cumtime'], reverse=True)[:TOP_N]
+
+
+def _memory_summary():
+    if not tracemalloc.is_tracing():
+        return None
+    current, peak = tracemalloc.get_traced_memory()
+    top = [{'location': str(stat.traceback), 'bytes': stat.size, 'count': stat.count}
+           for stat in tracemalloc.take_snapshot().statistics('lineno')[:TOP_N]]
+    tracemalloc.stop()
+    return {'current_bytes': current, 'peak_bytes': peak, 'top': top}
+
+
+def snapshot():
+    with _lock:
+        stages = {name: dict(entry) for name, entry in _stages.items()}
+    for entry in stages.values():
+        entry['rows_per_s'] = entry['rows'] / entry['seconds'] if entry['seconds'] else None
+        entry['bytes_per_s'] = entry['bytes'] / entry['seconds'] if entry['seconds'] else None
+    return stages
+
+
+def write_report(tool, path=None):
+    """Write the run's stage timings (and any profiles) as JSON; returns the path."""
+    report = {
+        'tool': tool,
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'python': sys.version.split()[0],
+        'wall_seconds': time.perf_counter() - _started,
+        'stages': snapshot(),
+        'profile': _profile_summary(),
+        'memory': _memory_summary()
+    }
+    if path is None:
+        os.makedirs(REPORT_DIR, exist_ok=True)
+        path = os.path.join(REPORT_DIR, f"{tool}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+    print(f"Timing report saved to {path}")
+    return path
+
+
+def compare_reports(old_path, new_path):
+    """Print per-stage time changes between two reports."""
+    with open(old_path, 'r', encoding='utf-8') as f:
+        old = json.load(f)
+    with open(new_path, 'r', encoding='utf-8') as f:
+        new = json.load(f)
+
+    print(f"{'stage':<28}{'old s':>10}{'new s':>10}{'change':>10}{'rows':>12}{'MB':>10}")
+    for name in sorted(set(old['stages']) | set(new['stages'])):
+        o = old['stages'].get(name, {})
+        n = new['stages'].get(name, {})
+        o_s, n_s = o.get('seconds'), n.get('seconds')
+        change = f"{(n_s - o_s) / o_s * 100:+.1f}%" if o_s and n_s is not None else ''
+        print(f"{name:<28}{o_s if o_s is not None else float('nan'):>10.3f}"
+              f"{n_s if n_s is not None else float('nan'):>10.3f}{change:>10}"
+              f"{n.get('rows', 0):>12}{n.get('bytes', 0) / (1024 * 1024):>10.1f}")
+    print(f"{'wall':<28}{old['wall_seconds']:>10.3f}{new['wall_seconds']:>10.3f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare two extraction timing reports")
+    parser.add_argument('old')
+    parser.add_argument('new')
+    args = parser.parse_args()
+    compare_reports(args.old, args.new)
+
+
+if __name__ == '__main__':
+    main()
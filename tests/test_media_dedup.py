@@ -0,0 +1,86 @@
+import os
+
+import pytest
+
+import media_dedup
+
+SIZE = 3 * media_dedup.PARTIAL_BYTES
+OLD_MTIME_NS = 1600000000 * 10**9
+
+
+def _write(path, data, mtime_ns=None):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'wb') as f:
+        f.write(data)
+    if mtime_ns is not None:
+        os.utime(path, ns=(mtime_ns, mtime_ns))
+    return path
+
+
+@pytest.fixture
+def tree(tmp_path):
+    media = tmp_path / 'media'
+    content = bytes(range(256)) * (SIZE // 256)
+    paths = {
+        'a': _write(str(media / 'a.jpg'), content),
+        'b': _write(str(media / 'sub' / 'b.jpg'), content, OLD_MTIME_NS),
+        # Same size and same head and tail as a; only a full hash tells them apart.
+        'c': _write(str(media / 'c.jpg'), content[:SIZE // 2] + b'\xff' + content[SIZE // 2 + 1:]),
+        'd': _write(str(media / 'd.jpg'), b'unique'),
+    }
+    return str(tmp_path), str(media), content, paths
+
+
+def test_duplicates_are_linked(tree):
+    root, media, _, paths = tree
+    stats = media_dedup.dedupe_tree(root, dirs=[media])
+    assert stats['linked'] == 1
+    assert stats['duplicate_groups'] == 1
+    assert stats['bytes_hashed'] == 3 * SIZE
+    assert os.path.samefile(paths['a'], paths['b'])
+    assert not os.path.samefile(paths['a'], paths['c'])
+
+    manifest = media_dedup.load_manifest(root)
+    (obj,) = manifest['objects'].values()
+    assert obj['paths'] == sorted([paths['a'], paths['b']])
+
+
+def test_no_link_only_records(tree):
+    root, media, _, paths = tree
+    stats = media_dedup.dedupe_tree(root, link=False, dirs=[media])
+    assert (stats['linked'], stats['referenced']) == (0, 1)
+    assert not os.path.samefile(paths['a'], paths['b'])
+
+
+def test_cache_avoids_rehashing(tree):
+    root, media, content, paths = tree
+    media_dedup.dedupe_tree(root, dirs=[media])
+
+    stats = media_dedup.dedupe_tree(root, dirs=[media])
+    assert stats['bytes_hashed'] == 0
+    assert stats['duplicate_groups'] == 1
+
+    # A new file of the same size whose partial hash matches nothing cached is not read in full.
+    _write(os.path.join(media, 'e.jpg'), b'\1' * SIZE)
+    stats = media_dedup.dedupe_tree(root, dirs=[media])
+    assert stats['bytes_hashed'] == 0
+
+    # A new copy shares its partial hash with a cached file, so it is fully hashed and linked.
+    copy = _write(os.path.join(media, 'f.jpg'), content)
+    stats = media_dedup.dedupe_tree(root, dirs=[media])
+    assert stats['bytes_hashed'] == SIZE
+    assert stats['linked'] == 1
+    assert os.path.samefile(paths['a'], copy)
+
+
+def test_original_times_are_kept(tree):
+    root, media, _, paths = tree
+    media_dedup.dedupe_tree(root, dirs=[media])
+    assert os.stat(paths['b']).st_mtime_ns != OLD_MTIME_NS
+
+    for _ in range(2):
+        manifest = media_dedup.load_manifest(root)
+        (obj,) = manifest['objects'].values()
+        assert obj['times'][paths['b']][0] == OLD_MTIME_NS
+        assert obj['times'][paths['a']][0] == os.stat(paths['a']).st_mtime_ns
+        media_dedup.dedupe_tree(root, dirs=[media])
@@ -0,0 +1,122 @@
+import os
+
+import pytest
+
+import remote_sync
+
+REMOTE_ROOT = '/sdcard/DCIM'
+MTIME = 1700000000
+
+
+@pytest.fixture
+def fake_pull(monkeypatch):
+    """Replace `adb pull` with a stub that writes each file with its listed size and mtime."""
+    state = {'listing': {}, 'fail': set(), 'stale': set(), 'batches': []}
+
+    def pull_batch(local_dir, remote_paths):
+        state['batches'].append(list(remote_paths))
+        os.makedirs(local_dir, exist_ok=True)
+        ok = True
+        for remote_path in remote_paths:
+            if remote_path in state['fail']:
+                ok = False
+                continue
+            size, mtime = state['listing'][remote_path]
+            local_path = os.path.join(local_dir, os.path.basename(remote_path))
+            with open(local_path, 'wb') as f:
+                f.write(b'x' * size)
+            if remote_path in state['stale']:
+                mtime -= 100
+            os.utime(local_path, (mtime, mtime))
+        return ok
+
+    monkeypatch.setattr(remote_sync, '_pull_batch', pull_batch)
+    return state
+
+
+def _listing(n, size=10):
+    return {f"{REMOTE_ROOT}/Camera/img{i}.jpg": (size + i, MTIME + i) for i in range(n)}
+
+
+def test_plan_pulls_skips_unchanged(tmp_path):
+    listing = _listing(3)
+    local_root = str(tmp_path)
+    pulls = remote_sync.plan_pulls(listing, REMOTE_ROOT, local_root, {})
+    assert len(pulls) == 3
+    assert pulls[0][1] == os.path.join(local_root, 'DCIM', 'Camera', 'img0.jpg')
+
+    remote_path, local_path, size, mtime = pulls[0]
+    os.makedirs(os.path.dirname(local_path))
+    with open(local_path, 'wb') as f:
+        f.write(b'x' * size)
+    manifest = {remote_path: [size, mtime]}
+    assert len(remote_sync.plan_pulls(listing, REMOTE_ROOT, local_root, manifest)) == 2
+
+    # A changed mtime, or a local copy that went missing, is pulled again.
+    changed = dict(listing, **{remote_path: (size, mtime + 1)})
+    assert len(remote_sync.plan_pulls(changed, REMOTE_ROOT, local_root, manifest)) == 3
+    os.remove(local_path)
+    assert len(remote_sync.plan_pulls(listing, REMOTE_ROOT, local_root, manifest)) == 3
+
+
+def test_sync_tree_pulls_then_skips(tmp_path, fake_pull):
+    fake_pull['listing'] = _listing(5)
+    stats = remote_sync.sync_tree(REMOTE_ROOT, str(tmp_path), listing=fake_pull['listing'])
+    assert (stats['pulled'], stats['failed'], stats['unchanged']) == (5, 0, 0)
+
+    stats = remote_sync.sync_tree(REMOTE_ROOT, str(tmp_path), listing=fake_pull['listing'])
+    assert (stats['pulled'], stats['unchanged']) == (0, 5)
+    assert len(fake_pull['batches']) == 1
+
+
+def test_sync_tree_failed_batch_not_recorded(tmp_path, fake_pull):
+    listing = fake_pull['listing'] = _listing(3)
+    first = f"{REMOTE_ROOT}/Camera/img0.jpg"
+    fake_pull['fail'] = {first}
+    stats = remote_sync.sync_tree(REMOTE_ROOT, str(tmp_path), listing=listing)
+    # The whole batch failed, even the files that happen to be on disk.
+    assert (stats['pulled'], stats['failed']) == (0, 3)
+    assert remote_sync.load_manifest(str(tmp_path)) == {}
+
+    fake_pull['fail'] = set()
+    stats = remote_sync.sync_tree(REMOTE_ROOT, str(tmp_path), listing=listing)
+    assert stats['pulled'] == 3
+
+
+def test_sync_tree_stale_copy_not_recorded(tmp_path, fake_pull):
+    listing = fake_pull['listing'] = _listing(2)
+    stale = f"{REMOTE_ROOT}/Camera/img1.jpg"
+    fake_pull['stale'] = {stale}
+    stats = remote_sync.sync_tree(REMOTE_ROOT, str(tmp_path), listing=listing)
+    assert (stats['pulled'], stats['failed']) == (1, 1)
+    assert stale not in remote_sync.load_manifest(str(tmp_path))
+
+
+def test_sync_tree_prunes_only_on_good_listing(tmp_path, fake_pull, monkeypatch):
+    listing = fake_pull['listing'] = _listing(3)
+    remote_sync.sync_tree(REMOTE_ROOT, str(tmp_path), listing=listing)
+
+    monkeypatch.setattr(remote_sync, 'list_remote_tree', lambda root: None)
+    stats = remote_sync.sync_tree(REMOTE_ROOT, str(tmp_path))
+    assert stats['listing_failed']
+    assert set(remote_sync.load_manifest(str(tmp_path))) == set(listing)
+
+    gone = f"{REMOTE_ROOT}/Camera/img2.jpg"
+    remaining = {path: entry for path, entry in listing.items() if path != gone}
+    remote_sync.sync_tree(REMOTE_ROOT, str(tmp_path), listing=remaining)
+    assert set(remote_sync.load_manifest(str(tmp_path))) == set(remaining)
+
+
+@pytest.mark.parametrize('returncode, stdout, stderr, expected', [
+    (0, f"12 {MTIME} {REMOTE_ROOT}/a.jpg\n", '', {f"{REMOTE_ROOT}/a.jpg": (12, MTIME)}),
+    (1, '', f"find: {REMOTE_ROOT}: No such file or directory", {}),
+    (1, f"12 {MTIME} {REMOTE_ROOT}/a.jpg\n", 'find: Permission denied', None),
+    (255, '', 'error: no devices/emulators found', None),
+])
+def test_list_remote_tree_failures(monkeypatch, returncode, stdout, stderr, expected):
+    class Result:
+        pass
+    result = Result()
+    result.returncode, result.stdout, result.stderr = returncode, stdout, stderr
+    monkeypatch.setattr(remote_sync.subprocess, 'run', lambda *a, **k: result)
+    assert remote_sync.list_remote_tree(REMOTE_ROOT) == expected
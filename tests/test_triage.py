@@ -0,0 +1,116 @@
+import os
+import time
+import threading
+from types import SimpleNamespace
+
+import pytest
+
+import triage
+
+WRITERS = ['sms', 'sms_report', 'mms', 'calls', 'calls_report', 'media_list', 'whatsapp_db',
+           'whatsapp_media', 'social', 'whatsapp_decrypt', 'chat', 'dedupe', 'index']
+
+
+def _ctx(skip=None, only=None, chat=None, wa_key=None):
+    return SimpleNamespace(skip=skip, only=only, chat=chat, wa_key=wa_key, verbose=False)
+
+
+def test_defaults_drop_stages_without_inputs():
+    stages = triage.select_stages(_ctx())
+    assert 'chat' not in stages
+    assert 'whatsapp_decrypt' not in stages
+    assert stages['archive'][2] == [name for name in WRITERS if name not in ('chat', 'whatsapp_decrypt')]
+
+
+def test_archive_still_waits_for_writers_when_middle_stages_are_skipped():
+    stages = triage.select_stages(_ctx(skip=['dedupe', 'index', 'sms_report', 'calls_report']))
+    after = stages['archive'][2]
+    for name in ('sms', 'calls', 'mms', 'media_list', 'whatsapp_db', 'whatsapp_media', 'social'):
+        assert name in after
+    assert 'dedupe' not in after
+
+
+def test_skipping_a_stage_drops_its_hard_dependents():
+    stages = triage.select_stages(_ctx(skip=['device'], chat='chat.txt'))
+    assert set(stages) == {'chat', 'dedupe', 'index', 'archive'}
+    assert stages['archive'][2] == ['chat', 'dedupe', 'index']
+    assert stages['dedupe'][2] == []
+
+    stages = triage.select_stages(_ctx(skip=['sms'], wa_key='key'))
+    assert 'sms_report' not in stages
+    assert 'whatsapp_decrypt' in stages
+
+
+def test_only_pulls_in_hard_dependencies():
+    stages = triage.select_stages(_ctx(only=['sms_report']))
+    assert set(stages) == {'device', 'sms', 'sms_report'}
+
+    stages = triage.select_stages(_ctx(only=['archive', 'whatsapp_decrypt'], wa_key='key'))
+    assert set(stages) == {'device', 'whatsapp_db', 'whatsapp_decrypt', 'archive'}
+    assert stages['archive'][2] == ['whatsapp_db', 'whatsapp_decrypt']
+
+    # Without a key the decrypt stage cannot run, even when asked for.
+    stages = triage.select_stages(_ctx(only=['whatsapp_decrypt']))
+    assert 'whatsapp_decrypt' not in stages
+
+
+def _stub_stages(selected, log, fail=()):
+    """Keep the selected graph but replace each stage with one that records when it ran."""
+    lock = threading.Lock()
+
+    def make(name):
+        def run(ctx, inputs):
+            with lock:
+                log.append(('start', name))
+            time.sleep(0.01)
+            with lock:
+                log.append(('end', name))
+            if name in fail:
+                raise RuntimeError(f"{name} broke")
+            return name
+        return run
+
+    return {name: (make(name), deps, after, False) for name, (_, deps, after, _) in selected.items()}
+
+
+@pytest.mark.parametrize('skip, fail', [
+    (None, ()),
+    (['dedupe', 'index'], ()),
+    (['sms_report', 'calls_report', 'dedupe'], ['mms']),
+])
+def test_run_dag_runs_archive_last(skip, fail):
+    log = []
+    stages = _stub_stages(triage.select_stages(_ctx(skip=skip)), log, fail)
+    status = triage.run_dag(stages, _ctx(), workers=4)
+
+    assert status['archive'] == 'ok'
+    archive_start = log.index(('start', 'archive'))
+    for name in stages:
+        if name != 'archive':
+            assert log.index(('end', name)) < archive_start
+    for name in fail:
+        assert status[name] == 'failed'
+
+
+def test_run_dag_skips_hard_dependents_of_failures():
+    log = []
+    stages = _stub_stages(triage.select_stages(_ctx()), log, fail=['sms', 'device'])
+    status = triage.run_dag(stages, _ctx(), workers=4)
+    assert status['device'] == 'failed'
+    for name in ('sms', 'sms_report', 'mms', 'calls', 'whatsapp_media', 'social'):
+        assert status[name] == 'skipped'
+        assert ('start', name) not in log
+    assert status['dedupe'] == status['index'] == status['archive'] == 'ok'
+
+
+def test_run_dag_merges_process_stage_telemetry(tmp_path, monkeypatch):
+    chat = tmp_path / 'chat.txt'
+    chat.write_text("14/05/24, 9:23 pm - Alice: hello\n", encoding='utf-8')
+    monkeypatch.chdir(tmp_path)
+    os.makedirs(triage.REPORT_DIR)
+    stages = triage.select_stages(_ctx(only=['chat'], chat=str(chat)))
+    status = triage.run_dag(stages, _ctx(chat=str(chat)), workers=2)
+    assert status == {'chat': 'ok'}
+    assert os.path.isfile(os.path.join(triage.REPORT_DIR, 'whatsapp_chat.csv'))
+    # Recorded in the worker process and merged back into this one.
+    assert triage.telemetry.snapshot()['chat.parse']['rows'] == 1
@@ -0,0 +1,82 @@
+import os
+import sqlite3
+
+import pytest
+
+from whatsapp_db_decryptor import decrypt_database, encrypt_database, iter_messages
+
+START_MS = 1672531200000
+
+
+@pytest.fixture
+def msgstore(tmp_path):
+    path = tmp_path / 'msgstore.db'
+    conn = sqlite3.connect(path)
+    conn.executescript("""
+        CREATE TABLE jid (_id INTEGER PRIMARY KEY, raw_string TEXT);
+        CREATE TABLE chat (_id INTEGER PRIMARY KEY, jid_row_id INTEGER, subject TEXT);
+        CREATE TABLE message (_id INTEGER PRIMARY KEY, chat_row_id INTEGER, from_me INTEGER,
+                              sender_jid_row_id INTEGER, timestamp INTEGER, text_data TEXT);
+        INSERT INTO jid VALUES (1, '919000000001@s.whatsapp.net');
+        INSERT INTO chat VALUES (1, 1, NULL);
+    """)
+    conn.executemany("INSERT INTO message VALUES (?, 1, ?, NULL, ?, ?)",
+                     [(i, i % 2, START_MS + i * 1000, f"message {i}") for i in range(1, 2001)])
+    conn.commit()
+    conn.close()
+    return path
+
+
+@pytest.fixture
+def key(tmp_path):
+    path = tmp_path / 'key'
+    path.write_text(os.urandom(32).hex())
+    return path
+
+
+@pytest.mark.parametrize('version', [14, 15])
+@pytest.mark.parametrize('md5_trailer', [True, False])
+def test_round_trip(tmp_path, msgstore, key, version, md5_trailer):
+    backup = tmp_path / f'msgstore.db.crypt{version}'
+    encrypt_database(str(msgstore), str(key), str(backup), crypt_version=version, md5_trailer=md5_trailer)
+
+    out = decrypt_database(str(backup), str(key), str(tmp_path / 'out.db'), chunk_size=4096)
+
+    assert out == str(tmp_path / 'out.db')
+    assert (tmp_path / 'out.db').read_bytes() == msgstore.read_bytes()
+    messages = list(iter_messages(out))
+    assert len(messages) == 2000
+    assert messages[0]['message'] == 'message 1'
+    assert messages[0]['sender'] == 'Me'
+    assert messages[1]['sender'] == '919000000001'
+
+
+def test_tampered_backup_fails(tmp_path, msgstore, key):
+    backup = tmp_path / 'msgstore.db.crypt15'
+    encrypt_database(str(msgstore), str(key), str(backup))
+    data = bytearray(backup.read_bytes())
+    data[-40] ^= 0x01
+    backup.write_bytes(bytes(data))
+
+    assert decrypt_database(str(backup), str(key), str(tmp_path / 'out.db')) is None
+    assert not (tmp_path / 'out.db').exists()
+    assert not (tmp_path / 'out.db.part').exists()
+
+
+def test_wrong_key_fails(tmp_path, msgstore, key):
+    backup = tmp_path / 'msgstore.db.crypt15'
+    encrypt_database(str(msgstore), str(key), str(backup))
+    other = tmp_path / 'other_key'
+    other.write_text(os.urandom(32).hex())
+
+    assert decrypt_database(str(backup), str(other), str(tmp_path / 'out.db')) is None
+    assert not (tmp_path / 'out.db').exists()
+
+
+def test_truncated_backup_fails(tmp_path, msgstore, key):
+    backup = tmp_path / 'msgstore.db.crypt15'
+    encrypt_database(str(msgstore), str(key), str(backup))
+    backup.write_bytes(backup.read_bytes()[:-48])
+
+    assert decrypt_database(str(backup), str(key), str(tmp_path / 'out.db')) is None
+    assert not (tmp_path / 'out.db').exists()
@@ -0,0 +1,277 @@
+"""
+Headless triage: every extractor as one DAG of stages.
+
+    python triage.py --start-date 2024-01-01 --chat chat.txt --wa-key key
+
+Independent stages run concurrently, so a full triage takes about as long as its
+slowest chain of stages rather than the sum of all of them.
+"""
+import os
+import time
+import argparse
+import traceback
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, wait, FIRST_COMPLETED
+
+import telemetry
+import adb_sms_extractor
+import call_log_extractor
+import media_file_extractor
+import mms_extractor
+import unified_data_extractor
+import whatsapp_chat_parser
+from content_query import date_arg
+from media_dedup import dedupe_tree
+
+REPORT_DIR = os.path.join("extracted", "reports")
+MMS_DIR = os.path.join("extracted", "mms")
+
+
+def stage_device(ctx, inputs):
+    devices = adb_sms_extractor.run_command(['adb', 'devices'])
+    lines = [line for line in (devices or '').splitlines()[1:] if line.strip().endswith('device')]
+    if not lines:
+        raise RuntimeError("No device connected or unauthorized")
+    return lines
+
+
+def stage_sms(ctx, inputs):
+    messages = adb_sms_extractor.get_sms_messages(ctx.start_date, ctx.end_date, ctx.contact)
+    adb_sms_extractor.save_messages(messages, os.path.join(REPORT_DIR, 'sms_messages.csv'))
+    return messages
+
+
+def stage_sms_report(ctx, inputs):
+    adb_sms_extractor.export_sms_pdf(inputs['sms'], os.path.join(REPORT_DIR, 'sms_messages.pdf'))
+
+
+def stage_mms(ctx, inputs):
+    return len(mms_extractor.extract_mms(ctx.start_date, ctx.end_date, ctx.contact, MMS_DIR))
+
+
+def stage_calls(ctx, inputs):
+    where = call_log_extractor.build_call_log_where(ctx.start_date, ctx.end_date, ctx.contact)
+    output = call_log_extractor.run_command(call_log_extractor.build_query_command(
+        'content://call_log/calls', projection=call_log_extractor.CALL_LOG_COLUMNS, where=where, sort='date DESC'))
+    if not output:
+        raise RuntimeError("Failed to retrieve call logs")
+    logs = call_log_extractor.parse_call_logs(output)
+    logs.sort(key=lambda x: int(x.get('date', '0')), reverse=True)
+    call_log_extractor.save_call_logs(logs, os.path.join(REPORT_DIR, 'call_logs.csv'))
+    return logs
+
+
+def stage_calls_report(ctx, inputs):
+    call_log_extractor.export_call_logs_pdf(inputs['calls'], os.path.join(REPORT_DIR, 'call_logs.pdf'))
+
+
+def stage_media_list(ctx, inputs):
+    where = media_file_extractor.build_media_where(ctx.start_date, ctx.end_date, ctx.folder, end_of_day=True)
+    total = 0
+    for uri in media_file_extractor.MEDIA_URIS:
+        rows = media_file_extractor.parse_output(media_file_extractor.run_adb_query(uri, where))
+        kind = uri.split('/')[-2]
+        media_file_extractor.save_media_csv(rows, os.path.join(REPORT_DIR, f'media_{kind}.csv'))
+        total += len(rows)
+    return total
+
+
+def stage_whatsapp_db(ctx, inputs):
+    unified_data_extractor.ensure_directories()
+    unified_data_extractor.pull_whatsapp_databases()
+
+
+def stage_whatsapp_media(ctx, inputs):
+    unified_data_extractor.ensure_directories()
+    unified_data_extractor.pull_whatsapp_media()
+
+
+def stage_social(ctx, inputs):
+    unified_data_extractor.pull_additional_social_data()
+
+
+def stage_whatsapp_decrypt(ctx, inputs):
+    from whatsapp_db_decryptor import decrypt_database, iter_messages, save_messages_csv
+    backups = sorted(name for name in os.listdir(unified_data_extractor.DB_DEST)
+                     if name.startswith('msgstore') and name.endswith(('.crypt14', '.crypt15')))
+    if not backups:
+        raise RuntimeError("No msgstore backup was pulled")
+    # The unsuffixed msgstore is the most recent backup.
+    latest = min(backups, key=len)
+    db_path = decrypt_database(os.path.join(unified_data_extractor.DB_DEST, latest), ctx.wa_key)
+    if not db_path:
+        raise RuntimeError(f"Could not decrypt {latest}")
+    return save_messages_csv(iter_messages(db_path), os.path.join(REPORT_DIR, 'whatsapp_messages.csv'))
+
+
+def stage_chat(ctx, inputs):
+    with open(ctx.chat, 'r', encoding='utf-8') as f:
+        rows = whatsapp_chat_parser.parse_chat_lines(f)
+    whatsapp_chat_parser.save_chat_csv(rows, os.path.join(REPORT_DIR, 'whatsapp_chat.csv'))
+    return len(rows)
+
+
+def stage_dedupe(ctx, inputs):
+    return dedupe_tree("extracted", dirs=unified_data_extractor.DEDUP_DIRS + [os.path.join(MMS_DIR, 'attachments')])
+
+
+def stage_index(ctx, inputs):
+    from media_indexer import build_index
+    # Forked workers would inherit the pipes of adb calls running in other stage threads.
+    return build_index("extracted", mp_context=multiprocessing.get_context('spawn'))
+
+
+def stage_archive(ctx, inputs):
+    unified_data_extractor.zip_exported_data()
+
+
+# name: (function, hard dependencies, ordering-only dependencies, run in a process)
+# A stage runs only if its hard dependencies succeeded; ordering-only ones just have to finish.
+# Ordering is not transitive once a stage is skipped, so list every stage whose files must be
+# complete first directly rather than relying on a chain through another stage.
+STAGES = {
+    'device': (stage_device, [], [], False),
+    'sms': (stage_sms, ['device'], [], False),
+    'sms_report': (stage_sms_report, ['sms'], [], True),
+    'mms': (stage_mms, ['device'], [], False),
+    'calls': (stage_calls, ['device'], [], False),
+    'calls_report': (stage_calls_report, ['calls'], [], True),
+    'media_list': (stage_media_list, ['device'], [], False),
+    'whatsapp_db': (stage_whatsapp_db, ['device'], [], False),
+    'whatsapp_media': (stage_whatsapp_media, ['device'], [], False),
+    'social': (stage_social, ['device'], [], False),
+    'whatsapp_decrypt': (stage_whatsapp_decrypt, ['whatsapp_db'], [], False),
+    'chat': (stage_chat, [], [], True),
+    'dedupe': (stage_dedupe, [], ['mms', 'whatsapp_db', 'whatsapp_media', 'social', 'whatsapp_decrypt'], False),
+    'index': (stage_index, [], ['mms', 'whatsapp_media', 'social', 'dedupe'], False),
+    'archive': (stage_archive, [], ['sms', 'sms_report', 'mms', 'calls', 'calls_report', 'media_list',
+                                    'whatsapp_db', 'whatsapp_media', 'social', 'whatsapp_decrypt',
+                                    'chat', 'dedupe', 'index'], False),
+}
+
+
+def _run_in_process(func, ctx, inputs):
+    """Run a stage in a worker process and send its telemetry back with the result."""
+    # Workers are reused, so start from empty stages each time.
+    telemetry.start(profile=False, trace_memory=False)
+    result = func(ctx, inputs)
+    return result, telemetry.snapshot()
+
+
+def select_stages(ctx):
+    """Drop stages that were skipped or lack their inputs, and anything that hard-depends on them."""
+    skipped = set(ctx.skip or [])
+    if not ctx.chat:
+        skipped.add('chat')
+    if not ctx.wa_key:
+        skipped.add('whatsapp_decrypt')
+    if ctx.only:
+        wanted = set()
+        todo = list(ctx.only)
+        while todo:
+            name = todo.pop()
+            if name not in wanted:
+                wanted.add(name)
+                todo.extend(STAGES[name][1])
+        skipped |= set(STAGES) - wanted
+
+    selected = {}
+    for name in STAGES:
+        func, deps, after, in_process = STAGES[name]
+        if name in skipped or any(dep not in selected for dep in deps):
+            continue
+        selected[name] = (func, deps, after, in_process)
+    for name in list(selected):
+        func, deps, after, in_process = selected[name]
+        selected[name] = (func, deps, [a for a in after if a in selected], in_process)
+    return selected
+
+
+def run_dag(stages, ctx, workers=4):
+    """
+    Run stages as soon as their dependencies are done, on a thread pool (a process
+    pool for CPU-bound stages). Returns {name: 'ok' | 'failed' | 'skipped'}.
+    """
+    status = {}
+    results = {}
+    running = {}
+    started = {}
+    # Spawned rather than forked workers, so they don't inherit the pipes of adb calls
+    # running in other threads (which would keep those calls from ever seeing EOF).
+    spawn = multiprocessing.get_context('spawn')
+    with ThreadPoolExecutor(max_workers=workers) as threads, \
+            ProcessPoolExecutor(max_workers=2, mp_context=spawn) as processes:
+        while len(status) < len(stages):
+            progress = True
+            while progress:
+                progress = False
+                for name, (func, deps, after, in_process) in stages.items():
+                    if name in status or name in started:
+                        continue
+                    if any(status.get(dep) in ('failed', 'skipped') for dep in deps):
+                        status[name] = 'skipped'
+                        progress = True
+                        print(f"[triage] {name}: skipped")
+                    elif all(dep in status for dep in deps + after):
+                        inputs = {dep: results.get(dep) for dep in deps}
+                        if in_process:
+                            future = processes.submit(_run_in_process, func, ctx, inputs)
+                        else:
+                            future = threads.submit(func, ctx, inputs)
+                        running[future] = name
+                        started[name] = time.perf_counter()
+                        print(f"[triage] {name}: started")
+            if len(status) == len(stages):
+                break
+            if not running:
+                raise RuntimeError("Stage graph has a cycle or a missing dependency")
+
+            done, _ = wait(list(running), return_when=FIRST_COMPLETED)
+            for future in done:
+                name = running.pop(future)
+                telemetry.record(f'stage.{name}', time.perf_counter() - started[name])
+                try:
+                    if stages[name][3]:
+                        results[name], child_stages = future.result()
+                        telemetry.merge(child_stages)
+                    else:
+                        results[name] = future.result()
+                    status[name] = 'ok'
+                    print(f"[triage] {name}: done")
+                except Exception as e:
+                    status[name] = 'failed'
+                    print(f"[triage] {name}: failed: {e}")
+                    if ctx.verbose:
+                        traceback.print_exc()
+    return status
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a full headless triage of the connected device")
+    parser.add_argument('--start-date', type=date_arg, help="Only records on or after this date (YYYY-MM-DD)")
+    parser.add_argument('--end-date', type=date_arg, help="Only records up to this date (YYYY-MM-DD)")
+    parser.add_argument('--contact', help="Only SMS/MMS/calls whose number contains this text")
+    parser.add_argument('--folder', help="Only media whose path contains this folder name")
+    parser.add_argument('--chat', help="WhatsApp chat export (.txt) to parse")
+    parser.add_argument('--wa-key', help="Key file for decrypting the pulled msgstore backup")
+    parser.add_argument('--only', action='append', choices=list(STAGES), help="Run only these stages and their dependencies")
+    parser.add_argument('--skip', action='append', choices=list(STAGES), help="Skip these stages")
+    parser.add_argument('--workers', type=int, default=4, help="Concurrent stages")
+    parser.add_argument('--verbose', action='store_true', help="Print tracebacks for failed stages")
+    args = parser.parse_args()
+
+    os.makedirs(REPORT_DIR, exist_ok=True)
+    telemetry.start()
+    stages = select_stages(args)
+    try:
+        status = run_dag(stages, args, args.workers)
+    finally:
+        telemetry.write_report('triage')
+
+    print("\nTriage summary:")
+    for name in stages:
+        print(f"  {name:<18}{status.get(name, 'skipped')}")
+
+
+if __name__ == '__main__':
+    main()
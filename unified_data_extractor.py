@@ -2,6 +2,9 @@ import os
 import subprocess
 import shutil
 from datetime import datetime
+import telemetry
+from media_dedup import dedupe_tree
+from remote_sync import list_remote_tree, split_listing, sync_trees
 
 WHATSAPP_DB_PATH = "/sdcard/Android/media/com.whatsapp/WhatsApp/Databases"
 WHATSAPP_MEDIA_PATH = "/sdcard/Android/media/com.whatsapp/WhatsApp/Media"
@@ -14,11 +17,15 @@ EXTRA_SOCIAL_MEDIA_PATHS = {
     "telegram": "/sdcard/Android/media/org.telegram.messenger/Telegram",
     "instagram": "/sdcard/Android/media/com.instagram.android"
 }
+# Only pulled media is deduplicated; reports and databases under extracted/ are left alone.
+DEDUP_DIRS = [MEDIA_DEST] + [os.path.join("extracted", name) for name in EXTRA_SOCIAL_MEDIA_PATHS]
 
 
 def run_adb_command(cmd):
     try:
-        result = subprocess.run(cmd, capture_output=True, text=True, timeout=30)
+        with telemetry.stage('adb.run_command') as st:
+            result = subprocess.run(cmd, capture_output=True, text=True, timeout=30)
+            st.add(nbytes=telemetry.byte_len(result.stdout))
         return result.stdout.strip(), result.stderr.strip()
     except Exception as e:
         return "", str(e)
@@ -39,59 +46,88 @@ def pull_whatsapp_databases():
     for filename in out.splitlines():
         remote_path = f"{WHATSAPP_DB_PATH}/{filename.strip()}"
         print(f"➡️  Pulling {filename.strip()}...")
-        subprocess.run(["adb", "pull", remote_path, DB_DEST])
+        with telemetry.stage('adb.pull') as st:
+            subprocess.run(["adb", "pull", remote_path, DB_DEST])
+            local_path = os.path.join(DB_DEST, os.path.basename(remote_path))
+            if os.path.isfile(local_path):
+                st.add(rows=1, nbytes=os.path.getsize(local_path))
 
 
 def pull_whatsapp_media():
     print("\n🖼️ Pulling WhatsApp media...")
-    out, err = run_adb_command(["adb", "shell", "ls", WHATSAPP_MEDIA_PATH])
-    if "No such file" in err or not out:
+    listing = list_remote_tree(WHATSAPP_MEDIA_PATH)
+    if not listing:
         print("⚠️  No WhatsApp media folders found.")
         return
 
-    for folder in out.splitlines():
-        folder_name = folder.strip()
+    # One listing for the whole Media tree, then each folder syncs in parallel.
+    jobs = []
+    for folder_name, folder_listing in sorted(split_listing(listing, WHATSAPP_MEDIA_PATH).items()):
         remote_media_folder = f"{WHATSAPP_MEDIA_PATH}/{folder_name}"
         local_media_folder = os.path.join(MEDIA_DEST, folder_name)
-        os.makedirs(local_media_folder, exist_ok=True)
-        print(f"➡️  Pulling media folder: {folder_name}")
-        subprocess.run(["adb", "pull", remote_media_folder, local_media_folder])
+        print(f"➡️  Syncing media folder: {folder_name}")
+        jobs.append((remote_media_folder, local_media_folder, folder_listing))
+    sync_trees(jobs)
 
 
 def pull_additional_social_data():
+    jobs = []
     for name, path in EXTRA_SOCIAL_MEDIA_PATHS.items():
         print(f"\n🔍 Checking for {name.title()} data...")
-        out, err = run_adb_command(["adb", "shell", "ls", path])
-        if "No such file" in err or not out:
+        listing = list_remote_tree(path)
+        if not listing:
             print(f"⚠️  {name.title()} data not found.")
             continue
 
         dest_path = os.path.join("extracted", name)
-        os.makedirs(dest_path, exist_ok=True)
-        print(f"➡️  Pulling {name.title()} data...")
-        subprocess.run(["adb", "pull", path, dest_path])
+        print(f"➡️  Syncing {name.title()} data...")
+        jobs.append((path, dest_path, listing))
+    sync_trees(jobs)
 
+import json
 import zipfile
+@telemetry.timed('archive.zip')
 def zip_exported_data():
     archive_name = f"forensic_export_{datetime.now().strftime('%Y%m%d_%H%M%S')}.zip"
+    stored = {}
+    references = {}
     with zipfile.ZipFile(archive_name, 'w', zipfile.ZIP_DEFLATED) as zipf:
         for root, _, files in os.walk("extracted"):
-            for file in files:
+            for file in sorted(files):
                 full_path = os.path.join(root, file)
                 rel_path = os.path.relpath(full_path, "extracted")
+                # Hardlinked duplicates are archived once and listed as references.
+                st = os.stat(full_path)
+                key = (st.st_dev, st.st_ino)
+                if st.st_nlink > 1 and key in stored:
+                    references[rel_path] = stored[key]
+                    continue
+                stored[key] = rel_path
                 zipf.write(full_path, arcname=rel_path)
+                telemetry.count('archive.zip', rows=1, nbytes=st.st_size)
+        if references:
+            zipf.writestr("dedup_references.json", json.dumps(references, indent=1, sort_keys=True))
     print(f"\n🗜️  Data zipped to {archive_name}")
 
 
 def main():
     print("\n📱 Starting Forensic Extractor...")
-    ensure_directories()
-    pull_whatsapp_databases()
-    pull_whatsapp_media()
-    pull_additional_social_data()
-    zip_exported_data()
+    telemetry.start()
+    try:
+        ensure_directories()
+        with telemetry.stage('whatsapp.pull_databases'):
+            pull_whatsapp_databases()
+        with telemetry.stage('whatsapp.pull_media'):
+            pull_whatsapp_media()
+        with telemetry.stage('social.pull'):
+            pull_additional_social_data()
+        dedupe_tree("extracted", dirs=DEDUP_DIRS)
+        zip_exported_data()
+    finally:
+        telemetry.write_report('unified_data_extractor')
     print("\n✅ Extraction complete. Encrypted & media data is saved in ./extracted/")
     print("\n🔐 Reminder: Decryption of WhatsApp .crypt14 files requires the key from /data/data/com.whatsapp/files/key")
+    print("   Once you have it: python whatsapp_db_decryptor.py --key <key file> <msgstore.db.crypt14|.crypt15>")
 
 
 if __name__ == "__main__":
@@ -1,14 +1,19 @@
 import re
 import csv
-import tkinter as tk
-from tkinter import filedialog, ttk, messagebox
 from datetime import datetime
+import telemetry
 
 chat_data = []
 
+# Widgets, created by main()
+root = None
+tree = None
+summary_label = None
+
 # Regex pattern for Android export: 14/05/24, 9:23 pm - Name: Message
 chat_line_re = re.compile(r"^(\d{1,2}/\d{1,2}/\d{2}), (\d{1,2}:\d{2}) (am|pm) - (.*?): (.*)$")
 
+@telemetry.timed('chat.parse', rows=len)
 def parse_chat_lines(lines):
     parsed = []
     for line in lines:
@@ -28,7 +33,16 @@ def parse_chat_lines(lines):
             })
     return parsed
 
+def save_chat_csv(rows, path):
+    with telemetry.stage('chat.write_csv') as st, open(path, 'w', newline='', encoding='utf-8-sig') as f:
+        writer = csv.writer(f)
+        writer.writerow(['Date', 'Time', 'Sender', 'Message'])
+        for row in rows:
+            writer.writerow([row['date'], row['time'], row['sender'], row['message']])
+        st.add(rows=len(rows))
+
 def load_chat_file():
+    from tkinter import filedialog
     filepath = filedialog.askopenfilename(filetypes=[("Text files", "*.txt")])
     if not filepath:
         return
@@ -46,41 +60,50 @@ def populate_table(data):
         tree.insert('', 'end', values=(row['date'], row['time'], row['sender'], row['message']))
 
 def export_to_csv():
+    from tkinter import filedialog, messagebox
     if not chat_data:
         messagebox.showinfo("Export", "No data to export.")
         return
     path = filedialog.asksaveasfilename(defaultextension=".csv", filetypes=[("CSV", "*.csv")])
     if not path:
         return
-    with open(path, 'w', newline='', encoding='utf-8-sig') as f:
-        writer = csv.writer(f)
-        writer.writerow(['Date', 'Time', 'Sender', 'Message'])
-        for row in chat_data:
-            writer.writerow([row['date'], row['time'], row['sender'], row['message']])
+    save_chat_csv(chat_data, path)
     messagebox.showinfo("Export", f"Exported to {path}")
 
 def update_summary():
     summary_label.config(text=f"Total messages: {len(chat_data)}")
 
 # --- GUI ---
-root = tk.Tk()
-root.title("WhatsApp Chat Viewer")
-root.geometry("900x600")
+def main():
+    global root, tree, summary_label
+    import tkinter as tk
+    from tkinter import ttk
+
+    root = tk.Tk()
+    root.title("WhatsApp Chat Viewer")
+    root.geometry("900x600")
+
+    btn_frame = tk.Frame(root)
+    btn_frame.pack(pady=10)
 
-btn_frame = tk.Frame(root)
-btn_frame.pack(pady=10)
+    tk.Button(btn_frame, text="Load Chat (.txt)", command=load_chat_file).pack(side=tk.LEFT, padx=5)
+    tk.Button(btn_frame, text="Export to CSV", command=export_to_csv).pack(side=tk.LEFT, padx=5)
 
-tk.Button(btn_frame, text="Load Chat (.txt)", command=load_chat_file).pack(side=tk.LEFT, padx=5)
-tk.Button(btn_frame, text="Export to CSV", command=export_to_csv).pack(side=tk.LEFT, padx=5)
+    summary_label = tk.Label(root, text="Total messages: 0")
+    summary_label.pack()
 
-summary_label = tk.Label(root, text="Total messages: 0")
-summary_label.pack()
+    cols = ('Date', 'Time', 'Sender', 'Message')
+    tree = ttk.Treeview(root, columns=cols, show='headings', height=25)
+    for col in cols:
+        tree.heading(col, text=col)
+        tree.column(col, anchor='w', width=150 if col != 'Message' else 450)
+    tree.pack(fill='both', expand=True)
 
-cols = ('Date', 'Time', 'Sender', 'Message')
-tree = ttk.Treeview(root, columns=cols, show='headings', height=25)
-for col in cols:
-    tree.heading(col, text=col)
-    tree.column(col, anchor='w', width=150 if col != 'Message' else 450)
-tree.pack(fill='both', expand=True)
+    telemetry.start()
+    try:
+        root.mainloop()
+    finally:
+        telemetry.write_report('whatsapp_chat_parser')
 
-root.mainloop()
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,384 @@
+import os
+import csv
+import hmac
+import zlib
+import sqlite3
+import hashlib
+import argparse
+from datetime import datetime
+from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
+from cryptography.exceptions import InvalidTag
+import telemetry
+
+CHUNK_SIZE = 1024 * 1024
+
+# crypt14 layout: fixed header holding the IV, then the GCM stream, then a
+# 16-byte tag and a 16-byte MD5 of the file. Some app versions leave out the MD5.
+CRYPT14_IV_OFFSET = 67
+CRYPT14_DATA_OFFSETS = (191, 190, 189, 192)
+TAG_SIZE = 16
+MD5_SIZE = 16
+
+CRYPT15_KEY_LABEL = b"backup encryption"
+
+
+def _read_varint(buf, pos):
+    result = shift = 0
+    while True:
+        if pos >= len(buf):
+            raise ValueError("Truncated varint in backup header")
+        byte = buf[pos]
+        pos += 1
+        result |= (byte & 0x7F) << shift
+        if not byte & 0x80:
+            return result, pos
+        shift += 7
+
+
+def _protobuf_fields(buf):
+    """Yield (field_number, wire_type, value) for a flat protobuf message."""
+    pos = 0
+    while pos < len(buf):
+        tag, pos = _read_varint(buf, pos)
+        field, wire = tag >> 3, tag & 7
+        if wire == 0:
+            value, pos = _read_varint(buf, pos)
+        elif wire == 2:
+            size, pos = _read_varint(buf, pos)
+            value = buf[pos:pos + size]
+            pos += size
+        elif wire == 1:
+            value, pos = buf[pos:pos + 8], pos + 8
+        elif wire == 5:
+            value, pos = buf[pos:pos + 4], pos + 4
+        else:
+            raise ValueError(f"Unsupported protobuf wire type {wire}")
+        yield field, wire, value
+
+
+def _encode_varint(value):
+    out = bytearray()
+    while True:
+        byte = value & 0x7F
+        value >>= 7
+        if value:
+            out.append(byte | 0x80)
+        else:
+            out.append(byte)
+            return bytes(out)
+
+
+def _read_key_material(key_path):
+    """Return raw key bytes from a hex string, raw 32 bytes or a Java-serialised key file."""
+    with open(key_path, 'rb') as f:
+        data = f.read()
+    text = data.strip()
+    if len(text) == 64:
+        try:
+            return bytes.fromhex(text.decode('ascii'))
+        except (UnicodeDecodeError, ValueError):
+            pass
+    if len(data) < 32:
+        raise ValueError(f"Key file {key_path} is too short ({len(data)} bytes)")
+    return data[-32:]
+
+
+def derive_crypt15_key(root_key):
+    """Derive the AES key of an end-to-end encrypted (crypt15) backup from its 32-byte root key."""
+    private = hmac.new(b'\x00' * 32, root_key, hashlib.sha256).digest()
+    return hmac.new(private, CRYPT15_KEY_LABEL + b'\x01', hashlib.sha256).digest()
+
+
+def load_key(key_path, crypt_version):
+    material = _read_key_material(key_path)
+    if crypt_version == 15:
+        return derive_crypt15_key(material)
+    return material
+
+
+def crypt_version_of(path):
+    ext = os.path.splitext(path)[1].lower()
+    if ext.startswith('.crypt') and ext[6:].isdigit():
+        return int(ext[6:])
+    raise ValueError(f"Cannot tell the crypt version of {path}")
+
+
+def _read_crypt15_header(f):
+    """Return (iv, data_offset) from a crypt15 backup prefix."""
+    head = f.read(2)
+    if len(head) < 2:
+        raise ValueError("File too short for a crypt15 header")
+    size = head[0]
+    start = 2 if head[1] == 0x01 else 1
+    f.seek(start)
+    prefix = f.read(size)
+    for field, wire, value in _protobuf_fields(prefix):
+        if field == 3 and wire == 2:
+            for inner_field, inner_wire, inner_value in _protobuf_fields(value):
+                if inner_field == 1 and inner_wire == 2:
+                    return inner_value, start + size
+    raise ValueError("No IV found in crypt15 header")
+
+
+def _looks_like_zlib(key, iv, first_bytes):
+    decryptor = Cipher(algorithms.AES(key), modes.GCM(iv)).decryptor()
+    plain = decryptor.update(first_bytes)
+    return len(plain) >= 2 and plain[0] == 0x78 and ((plain[0] << 8) | plain[1]) % 31 == 0
+
+
+def _read_crypt14_header(f, key):
+    """Return (iv, data_offset); the data offset moved between app versions, so probe for it."""
+    f.seek(CRYPT14_IV_OFFSET)
+    iv = f.read(16)
+    for offset in CRYPT14_DATA_OFFSETS:
+        f.seek(offset)
+        if _looks_like_zlib(key, iv, f.read(16)):
+            return iv, offset
+    print("Could not detect the crypt14 data offset, assuming the default")
+    return iv, CRYPT14_DATA_OFFSETS[0]
+
+
+def _decrypt_stream(f, key, iv, data_offset, file_size, out_path, chunk_size):
+    """
+    Decrypt and inflate the GCM stream from data_offset into out_path in one pass.
+
+    The stream runs up to the last TAG_SIZE + MD5_SIZE bytes. If zlib has reached its
+    end there, those bytes are the tag and the MD5; otherwise the first half is still
+    ciphertext and the tag is the final TAG_SIZE bytes. Returns True if the tag verified.
+    Raises zlib.error if the plaintext is not a zlib stream.
+    """
+    decryptor = Cipher(algorithms.AES(key), modes.GCM(iv)).decryptor()
+    inflater = zlib.decompressobj()
+    f.seek(data_offset)
+    remaining = file_size - TAG_SIZE - MD5_SIZE - data_offset
+    with open(out_path, 'wb') as out:
+        while remaining > 0:
+            chunk = f.read(min(chunk_size, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            out.write(inflater.decompress(decryptor.update(chunk)))
+        trailer = f.read(TAG_SIZE + MD5_SIZE)
+        if inflater.eof:
+            tag = trailer[:TAG_SIZE]
+        else:
+            tag = trailer[TAG_SIZE:]
+            out.write(inflater.decompress(decryptor.update(trailer[:TAG_SIZE])))
+        out.write(inflater.flush())
+    try:
+        decryptor.finalize_with_tag(tag)
+    except InvalidTag:
+        return False
+    return inflater.eof
+
+
+@telemetry.timed('whatsapp.decrypt')
+def decrypt_database(encrypted_path, key_path, output_path=None, chunk_size=CHUNK_SIZE):
+    """
+    Decrypt and inflate a .crypt14/.crypt15 backup into a plain SQLite file.
+
+    The file is streamed through AES-GCM and zlib one chunk at a time, so memory use
+    does not grow with the size of the backup. The output is only written if the GCM
+    tag verifies, with or without the MD5 trailer. Returns the output path, or None.
+    """
+    version = crypt_version_of(encrypted_path)
+    if version not in (14, 15):
+        print(f"Unsupported backup format: .crypt{version}")
+        return None
+    key = load_key(key_path, version)
+    output_path = output_path or os.path.splitext(encrypted_path)[0]
+    partial_path = output_path + '.part'
+    file_size = os.path.getsize(encrypted_path)
+
+    verified = False
+    with open(encrypted_path, 'rb') as f:
+        if version == 15:
+            iv, data_offset = _read_crypt15_header(f)
+        else:
+            iv, data_offset = _read_crypt14_header(f, key)
+
+        if file_size - TAG_SIZE - MD5_SIZE <= data_offset:
+            print(f"{encrypted_path} is too short to hold a database")
+        else:
+            try:
+                verified = _decrypt_stream(f, key, iv, data_offset, file_size, partial_path, chunk_size)
+            except zlib.error as e:
+                print(f"Decryption of {encrypted_path} failed (wrong key?): {e}")
+
+    if not verified:
+        if os.path.exists(partial_path):
+            os.remove(partial_path)
+        print(f"Authentication failed for {encrypted_path}: the GCM tag did not verify or the data is incomplete")
+        return None
+    os.replace(partial_path, output_path)
+    telemetry.count('whatsapp.decrypt', nbytes=file_size)
+    print(f"Decrypted {encrypted_path} -> {output_path}")
+    return output_path
+
+
+def encrypt_database(db_path, key_path, output_path, crypt_version=15, md5_trailer=True):
+    """
+    Write a backup in the same layout decrypt_database() reads.
+
+    Used to build local fixtures; real backups always come from the device.
+    With md5_trailer=False the file ends at the GCM tag, as some app versions write it.
+    """
+    key = load_key(key_path, crypt_version)
+    iv = os.urandom(16)
+    if crypt_version == 15:
+        c15_iv = b'\x0a' + _encode_varint(len(iv)) + iv
+        prefix = b'\x08\x01' + b'\x1a' + _encode_varint(len(c15_iv)) + c15_iv
+        header = bytes([len(prefix), 0x01]) + prefix
+    else:
+        header = bytearray(os.urandom(CRYPT14_DATA_OFFSETS[0]))
+        header[CRYPT14_IV_OFFSET:CRYPT14_IV_OFFSET + 16] = iv
+        header = bytes(header)
+
+    encryptor = Cipher(algorithms.AES(key), modes.GCM(iv)).encryptor()
+    deflater = zlib.compressobj()
+    checksum = hashlib.md5()
+
+    def emit(out, data):
+        checksum.update(data)
+        out.write(data)
+
+    with open(db_path, 'rb') as f, open(output_path, 'wb') as out:
+        emit(out, header)
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b''):
+            emit(out, encryptor.update(deflater.compress(chunk)))
+        emit(out, encryptor.update(deflater.flush()) + encryptor.finalize())
+        emit(out, encryptor.tag)
+        if md5_trailer:
+            out.write(checksum.digest())
+    return output_path
+
+
+def _jid_user(jid):
+    return jid.split('@', 1)[0] if jid else ''
+
+
+def _tables(conn):
+    return {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type='table'")}
+
+
+def _record(timestamp, sender, text, chat, media_path='', media_mime=''):
+    try:
+        dt = datetime.fromtimestamp(int(timestamp) / 1000)
+    except (TypeError, ValueError, OverflowError, OSError):
+        return None
+    return {
+        'datetime': dt,
+        'date': dt.date().isoformat(),
+        'time': dt.time().isoformat(timespec='minutes'),
+        'sender': sender,
+        'message': text or '',
+        'chat': chat,
+        'media_path': media_path or '',
+        'media_mime': media_mime or ''
+    }
+
+
+def iter_messages(db_path):
+    """
+    Yield messages from a decrypted msgstore.db as whatsapp_chat_parser-style records.
+
+    Rows are streamed from the cursor, so large databases are never loaded whole.
+    Both the current (`message`/`chat`/`jid`) and the legacy (`messages`) schemas are read.
+    """
+    conn = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)
+    try:
+        tables = _tables(conn)
+        if 'message' in tables and 'jid' in tables:
+            media_join = ("LEFT JOIN message_media mm ON mm.message_row_id = m._id"
+                          if 'message_media' in tables else "")
+            media_cols = "mm.file_path, mm.mime_type" if media_join else "NULL, NULL"
+            query = f"""
+                SELECT m.timestamp, m.from_me, m.text_data, cj.raw_string, c.subject,
+                       sj.raw_string, {media_cols}
+                FROM message m
+                LEFT JOIN chat c ON c._id = m.chat_row_id
+                LEFT JOIN jid cj ON cj._id = c.jid_row_id
+                LEFT JOIN jid sj ON sj._id = m.sender_jid_row_id
+                {media_join}
+                ORDER BY m._id
+            """
+            for timestamp, from_me, text, chat_jid, subject, sender_jid, path, mime in conn.execute(query):
+                if not text and not path:
+                    continue
+                sender = 'Me' if from_me else _jid_user(sender_jid or chat_jid)
+                record = _record(timestamp, sender, text, subject or _jid_user(chat_jid), path, mime)
+                if record:
+                    yield record
+        elif 'messages' in tables:
+            query = """
+                SELECT timestamp, key_from_me, data, key_remote_jid, remote_resource,
+                       media_name, media_mime_type
+                FROM messages ORDER BY _id
+            """
+            for timestamp, from_me, text, chat_jid, resource, media_name, mime in conn.execute(query):
+                if not text and not media_name:
+                    continue
+                sender = 'Me' if from_me else _jid_user(resource or chat_jid)
+                record = _record(timestamp, sender, text, _jid_user(chat_jid), media_name, mime)
+                if record:
+                    yield record
+        else:
+            print(f"{db_path} does not look like a WhatsApp msgstore database")
+    finally:
+        conn.close()
+
+
+def list_chats(db_path):
+    """Return [{'jid', 'name'}] for every chat in a decrypted msgstore.db."""
+    conn = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)
+    try:
+        tables = _tables(conn)
+        if 'chat' in tables and 'jid' in tables:
+            rows = conn.execute("SELECT j.raw_string, c.subject FROM chat c "
+                                "JOIN jid j ON j._id = c.jid_row_id ORDER BY c._id")
+        elif 'chat_list' in tables:
+            rows = conn.execute("SELECT key_remote_jid, subject FROM chat_list ORDER BY _id")
+        else:
+            return []
+        return [{'jid': jid, 'name': subject or _jid_user(jid)} for jid, subject in rows]
+    finally:
+        conn.close()
+
+
+@telemetry.timed('whatsapp.write_csv')
+def save_messages_csv(records, filename):
+    """Stream records to CSV in the chat parser's column layout plus chat and media columns."""
+    count = 0
+    with open(filename, 'w', newline='', encoding='utf-8-sig') as f:
+        writer = csv.writer(f)
+        writer.writerow(['Date', 'Time', 'Sender', 'Message', 'Chat', 'Media Path', 'Media Type'])
+        for row in records:
+            writer.writerow([row['date'], row['time'], row['sender'], row['message'],
+                             row['chat'], row['media_path'], row['media_mime']])
+            count += 1
+    telemetry.count('whatsapp.write_csv', rows=count)
+    print(f"Saved {count} WhatsApp messages to {filename}")
+    return count
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Decrypt and parse WhatsApp .crypt14/.crypt15 backups")
+    parser.add_argument('backup', help="Path to msgstore.db.crypt14 or .crypt15")
+    parser.add_argument('--key', required=True,
+                        help="WhatsApp key file (crypt14) or 64-digit backup key / encrypted_backup.key (crypt15)")
+    parser.add_argument('--output', help="Where to write the decrypted database")
+    parser.add_argument('--csv', default='whatsapp_messages.csv', help="CSV file for the extracted messages")
+    args = parser.parse_args()
+
+    telemetry.start()
+    try:
+        db_path = decrypt_database(args.backup, args.key, args.output)
+        if db_path:
+            print(f"Found {len(list_chats(db_path))} chats")
+            save_messages_csv(iter_messages(db_path), args.csv)
+    finally:
+        telemetry.write_report('whatsapp_db_decryptor')
+
+
+if __name__ == '__main__':
+    main()